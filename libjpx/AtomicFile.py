@@ -0,0 +1,43 @@
+import os
+import uuid
+import contextlib
+
+
+
+#一時ファイルのパスを返し、書き込みを終えたらfile_pathに置き換える
+#
+#他のスレッドやプロセスが書き込み途中のファイルを読み込まないよう
+#同じディレクトリの一時ファイルに書き込んでから置き換える
+#書き込み中に例外が発生した場合は一時ファイルを削除し、file_pathは変更しない
+@contextlib.contextmanager
+def atomic_write_path(file_path):
+
+	dir_path = os.path.dirname(file_path)
+	if dir_path :
+		os.makedirs(dir_path, exist_ok = True)
+
+	#一時ファイルは通常のファイルと同様にumaskから決まるパーミッションで作成する
+	tmp_file_path = file_path + '.' + uuid.uuid4().hex + '.tmp'
+	os.close(os.open(tmp_file_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666))
+
+	try :
+
+		yield tmp_file_path
+
+		os.replace(tmp_file_path, file_path)
+
+	except BaseException :
+
+		if os.path.exists(tmp_file_path) :
+			os.remove(tmp_file_path)
+
+		raise
+
+
+#バイト列をfile_pathに書き込む
+def atomic_write(file_path, bdata):
+
+	with atomic_write_path(file_path) as tmp_file_path :
+
+		with open(tmp_file_path, 'wb') as f :
+			f.write(bdata)
@@ -5,7 +5,10 @@ import urllib.parse
 import logging
 import traceback
 import time
+import asyncio
 from .JPXError import JPXAnalysisError
+from .HTTPSessionPool import HTTPSessionPool
+from .XMLDataGetter import XMLDataGetter
 
 logger = logging.getLogger(__name__)
 
@@ -44,9 +47,8 @@ class TDnetAnalyzer() :
 
 
     @staticmethod
-    def get_DisclosureRecordList() :
+    def get_DisclosureRecordList(date_str = '20240517') :
 
-        date_str = '20240517'
         page_num = 1
         page_is_end = False
 
@@ -72,7 +74,7 @@ class TDnetAnalyzer() :
                 try :
 
                     logger.debug(f'request count : {retry_count} , url : {url}')
-                    r = requests.get(url)
+                    r = HTTPSessionPool.get(url)
 
                 except requests.exceptions.RequestException as e:
 
@@ -122,80 +124,187 @@ class TDnetAnalyzer() :
 
 
             #ページソースの解析
+            disclosure_record_list.extend(TDnetAnalyzer.__parse_disclosure_page(soup, date_str))
 
-            tr_elms = soup.select('table#main-list-table > tr')
-            for tr_elm in tr_elms :
+            #次のページへ
+            page_num = page_num + 1
 
-                kj_time_str = None
-                kj_code_str = None
-                kj_name_str = None
-                kj_title_str = None
-                pdf_url_str = None
-                xbrl_url_str = None
-                kj_place_str = None
-                kj_history_str = None
 
-                td_elms = tr_elm.select('td')
-                for td_elm in td_elms :
 
-                    class_list = td_elm.get("class")
-                    if 'kjTime' in class_list :
+        return disclosure_record_list
 
-                        kj_time_str = td_elm.get_text().strip()
 
-                    elif 'kjCode' in class_list :
+    #get_DisclosureRecordListの非同期版
+    #
+    #concurrent_page_num件のページを並行して取得する
+    #リクエスト頻度はXMLDataGetterと同じrate_limiterで接続先ホスト毎に制限される
+    #リトライ時の待機もイベントループを止めない
+    #通信に用いるセッションは全ページを取得し終えた時点で閉じる
+    @staticmethod
+    async def aget_DisclosureRecordList(date_str = '20240517', concurrent_page_num = 4) :
 
-                        kj_code_str = td_elm.get_text().strip()
+        async with HTTPSessionPool.async_session_scope() :
+            return await TDnetAnalyzer.__aget_disclosure_record_list(date_str, concurrent_page_num)
 
-                    elif 'kjName' in class_list :
 
-                        kj_name_str = td_elm.get_text().strip()
+    @staticmethod
+    async def __aget_disclosure_record_list(date_str, concurrent_page_num) :
 
-                    elif 'kjPlace' in class_list :
+        page_num = 1
+        page_is_end = False
 
-                        kj_place_str = td_elm.get_text().strip()
+        disclosure_record_list = list()
 
-                    elif 'kjHistroy' in class_list :
+        #最終ページまで処理する
+        while page_is_end == False :
 
-                        kj_history_str = td_elm.get_text().strip()
+            page_num_list = list(range(page_num, page_num + concurrent_page_num))
+            soup_list = await asyncio.gather(*[TDnetAnalyzer.__aget_disclosure_page(date_str, n) for n in page_num_list])
 
-                    elif 'kjTitle' in class_list :
+            #ページ順に解析し、最終ページを越えたページ以降は捨てる
+            for soup in soup_list :
 
-                        a_elm = td_elm.select_one('a')
+                if soup == None :
 
-                        kj_title_str =  a_elm.get_text().strip()
+                    page_is_end = True
+                    logger.debug('page is end')
 
-                        pdf_name_str = a_elm.get("href")
-                        pdf_url_str = urllib.parse.urljoin('https://www.release.tdnet.info/inbs/', pdf_name_str)
+                    break
 
+                disclosure_record_list.extend(TDnetAnalyzer.__parse_disclosure_page(soup, date_str))
 
-                    elif 'kjXbrl' in class_list :
+            #次のページへ
+            page_num = page_num + concurrent_page_num
 
-                        a_elm = td_elm.select_one('a')
 
-                        if a_elm != None :
+        return disclosure_record_list
 
-                            xbrl_name_str = a_elm.get("href")
-                            xbrl_url_str = urllib.parse.urljoin('https://www.release.tdnet.info/inbs/', xbrl_name_str)
 
-                        else :
+    #ページソースを非同期に取得する
+    #ページリソースがない(最終ページを越えている)ならNoneを返す
+    @staticmethod
+    async def __aget_disclosure_page(date_str, page_num) :
 
-                            xbrl_url_str = ""
+        #リクエストURLを生成
+        page_str = f'{page_num:03}'
+        url = f'https://www.release.tdnet.info/inbs/I_list_{page_str}_{date_str}'
 
+        retry_count = -1
+        while retry_count < 10 :
 
-                disclosure_record_list.append(TDnetDisclosureRecord(date_str, \
-                                                                        kj_time_str, \
-                                                                        kj_code_str, \
-                                                                        kj_name_str, \
-                                                                        kj_title_str, \
-                                                                        pdf_url_str, \
-                                                                        xbrl_url_str, \
-                                                                        kj_place_str, \
-                                                                        kj_history_str))
+            retry_count = retry_count + 1
+
+            try :
+
+                await XMLDataGetter.rate_limiter.acquire_async(url)
+
+                logger.debug(f'request count : {retry_count} , url : {url}')
+                status_code, headers, content = await HTTPSessionPool.aget(url)
+
+            except HTTPSessionPool.REQUEST_EXCEPTIONS as e:
+
+                logger.error(list(traceback.TracebackException.from_exception(e).format()))
+                await asyncio.sleep(10)
+
+                continue
+
+
+            if status_code == 404 :
+
+                return None
+
+
+            #その他のエラー
+            if status_code != 200 :
+
+                logger.debug(f'request status {status_code} , sleep 10s and retry')
+                await asyncio.sleep(10)
+
+                continue
+
+
+            return BeautifulSoup(content, 'html.parser')
+
+
+        #リトライオーバーしたら処理を終了する
+        raise JPXAnalysisError('リクエストリトライオーバー')
+
+
+    #ページソースを解析し開示情報のリストを取得する
+    @staticmethod
+    def __parse_disclosure_page(soup, date_str) :
+
+        disclosure_record_list = list()
+
+        tr_elms = soup.select('table#main-list-table > tr')
+        for tr_elm in tr_elms :
+
+            kj_time_str = None
+            kj_code_str = None
+            kj_name_str = None
+            kj_title_str = None
+            pdf_url_str = None
+            xbrl_url_str = None
+            kj_place_str = None
+            kj_history_str = None
+
+            td_elms = tr_elm.select('td')
+            for td_elm in td_elms :
+
+                class_list = td_elm.get("class")
+                if 'kjTime' in class_list :
+
+                    kj_time_str = td_elm.get_text().strip()
+
+                elif 'kjCode' in class_list :
+
+                    kj_code_str = td_elm.get_text().strip()
+
+                elif 'kjName' in class_list :
+
+                    kj_name_str = td_elm.get_text().strip()
+
+                elif 'kjPlace' in class_list :
+
+                    kj_place_str = td_elm.get_text().strip()
+
+                elif 'kjHistroy' in class_list :
+
+                    kj_history_str = td_elm.get_text().strip()
+
+                elif 'kjTitle' in class_list :
+
+                    a_elm = td_elm.select_one('a')
+
+                    kj_title_str =  a_elm.get_text().strip()
+
+                    pdf_name_str = a_elm.get("href")
+                    pdf_url_str = urllib.parse.urljoin('https://www.release.tdnet.info/inbs/', pdf_name_str)
+
+
+                elif 'kjXbrl' in class_list :
+
+                    a_elm = td_elm.select_one('a')
+
+                    if a_elm != None :
+
+                        xbrl_name_str = a_elm.get("href")
+                        xbrl_url_str = urllib.parse.urljoin('https://www.release.tdnet.info/inbs/', xbrl_name_str)
+
+                    else :
+
+                        xbrl_url_str = ""
 
-            #次のページへ
-            page_num = page_num + 1
 
+            disclosure_record_list.append(TDnetDisclosureRecord(date_str, \
+                                                                    kj_time_str, \
+                                                                    kj_code_str, \
+                                                                    kj_name_str, \
+                                                                    kj_title_str, \
+                                                                    pdf_url_str, \
+                                                                    xbrl_url_str, \
+                                                                    kj_place_str, \
+                                                                    kj_history_str))
 
 
         return disclosure_record_list
@@ -0,0 +1,190 @@
+import requests
+from requests.adapters import HTTPAdapter
+import asyncio
+import threading
+import weakref
+import contextlib
+
+#aiohttpがあれば非同期リクエストに用いる
+try :
+	import aiohttp
+except ImportError :
+	aiohttp = None
+
+
+
+#ライブラリ全体で共有するHTTPセッション
+#
+#接続を使い回す(keep-alive)ことで、リクエスト毎のTCP/TLSハンドシェイクを省く
+#テストなどで接続先を差し替えたい場合はset_sessionでセッションを設定する
+class HTTPSessionPool():
+
+	session = None
+
+	#ホスト毎に保持する接続数の上限
+	pool_maxsize = 16
+
+	lock = threading.Lock()
+
+	#イベントループ -> aiohttpのセッション
+	#aiohttpのセッションは生成したイベントループでしか使えないため、ループ毎に保持する
+	#終了したイベントループのセッションを保持し続けないよう、ループは弱参照で保持する
+	async_session_dict = weakref.WeakKeyDictionary()
+
+	#イベントループ -> async_session_scopeの実行中の数
+	async_scope_count_dict = weakref.WeakKeyDictionary()
+
+	#リクエスト失敗時に送出される例外
+	if aiohttp != None :
+		REQUEST_EXCEPTIONS = (requests.exceptions.RequestException, aiohttp.ClientError, asyncio.TimeoutError)
+	else :
+		REQUEST_EXCEPTIONS = (requests.exceptions.RequestException,)
+
+
+	@classmethod
+	def get_session(cls):
+
+		with cls.lock :
+
+			if cls.session == None :
+				cls.session = cls.create_session(cls.pool_maxsize)
+
+			return cls.session
+
+
+	@classmethod
+	def set_session(cls, session):
+
+		with cls.lock :
+
+			cls.session = session
+
+
+	#セッションを閉じ、保持している接続を解放する
+	#次にget_sessionを呼び出した際は新しいセッションを生成する
+	@classmethod
+	def close(cls):
+
+		with cls.lock :
+
+			if cls.session != None :
+				cls.session.close()
+
+			cls.session = None
+
+
+	@staticmethod
+	def create_session(pool_maxsize):
+
+		session = requests.Session()
+
+		adapter = HTTPAdapter(pool_connections = pool_maxsize, pool_maxsize = pool_maxsize)
+		session.mount('http://', adapter)
+		session.mount('https://', adapter)
+
+		return session
+
+
+	@classmethod
+	def get(cls, url, headers = None):
+
+		return cls.get_session().get(url, headers = headers)
+
+
+	#非同期にGETリクエストを送信し (status_code, headers, content) を返す
+	#
+	#aiohttpがあればイベントループ上で通信する
+	#無ければ共有セッションでのリクエストをスレッドプールで実行する
+	@classmethod
+	async def aget(cls, url, headers = None):
+
+		if aiohttp == None :
+
+			loop = asyncio.get_running_loop()
+			return await loop.run_in_executor(None, cls.__get_response_data, url, headers)
+
+
+		async with cls.get_async_session().get(url, headers = headers) as r :
+
+			content = await r.read()
+			return r.status, r.headers, content
+
+
+	@classmethod
+	def get_async_session(cls):
+
+		loop = asyncio.get_running_loop()
+
+		with cls.lock :
+
+			#既に終了したイベントループのセッションは使えないため破棄する
+			for closed_loop in [tmp_loop for tmp_loop in cls.async_session_dict if tmp_loop.is_closed()] :
+				del cls.async_session_dict[closed_loop]
+
+			if loop not in cls.async_session_dict or cls.async_session_dict[loop].closed :
+
+				connector = aiohttp.TCPConnector(limit_per_host = cls.pool_maxsize)
+				cls.async_session_dict[loop] = aiohttp.ClientSession(connector = connector)
+
+			return cls.async_session_dict[loop]
+
+
+	#aiohttpのセッションを利用する範囲
+	#
+	#実行中のイベントループで最後の範囲を抜けた時点でセッションを閉じる
+	#asyncio.runの度に新しいイベントループが生成されるため、
+	#非同期処理の入口(aprefetchなど)をこの範囲で囲み、セッションを閉じ忘れないようにする
+	@classmethod
+	@contextlib.asynccontextmanager
+	async def async_session_scope(cls):
+
+		loop = asyncio.get_running_loop()
+
+		with cls.lock :
+			cls.async_scope_count_dict[loop] = cls.async_scope_count_dict.get(loop, 0) + 1
+
+		try :
+			yield
+
+		finally :
+
+			async_session = None
+
+			with cls.lock :
+
+				scope_count = cls.async_scope_count_dict[loop] - 1
+
+				if scope_count == 0 :
+
+					del cls.async_scope_count_dict[loop]
+					async_session = cls.async_session_dict.pop(loop, None)
+
+				else :
+					cls.async_scope_count_dict[loop] = scope_count
+
+			if async_session != None :
+				await async_session.close()
+
+
+	#実行中のイベントループのaiohttpのセッションを閉じる
+	@classmethod
+	async def aclose(cls):
+
+		loop = asyncio.get_running_loop()
+
+		with cls.lock :
+
+			async_session = cls.async_session_dict.pop(loop, None)
+
+		if async_session != None :
+			await async_session.close()
+
+
+	@classmethod
+	def __get_response_data(cls, url, headers):
+
+		r = cls.get(url, headers)
+		response_data = (r.status_code, r.headers, r.content)
+		r.close()
+
+		return response_data
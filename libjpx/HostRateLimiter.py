@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+import urllib.parse
+
+
+
+#トークンバケット
+#
+#rate[回/秒]でトークンが補充され、最大capacity個まで貯められる
+#トークンが無い場合は補充されるまで待機する
+class TokenBucket():
+
+	def __init__(self, rate, capacity):
+
+		self.__rate = rate
+		self.__capacity = capacity
+
+		self.__tokens = capacity
+		self.__last_time = time.monotonic()
+
+		self.__lock = threading.Lock()
+
+
+	#トークンを1つ取得する
+	#取得できるまで待機する
+	def acquire(self):
+
+		while True :
+
+			wait_time = self.try_acquire()
+			if wait_time == 0 :
+				return
+
+			time.sleep(wait_time)
+
+
+	#トークンを1つ取得する
+	#取得できた場合は0を、できなかった場合は次のトークンが補充されるまでの秒数を返す
+	def try_acquire(self):
+
+		with self.__lock :
+
+			now = time.monotonic()
+			self.__tokens = min(self.__capacity, self.__tokens + (now - self.__last_time) * self.__rate)
+			self.__last_time = now
+
+			if self.__tokens >= 1 :
+
+				self.__tokens = self.__tokens - 1
+				return 0
+
+			return (1 - self.__tokens) / self.__rate
+
+
+
+#接続先ホスト毎のリクエスト頻度の制限
+#
+#ホスト毎にトークンバケットを持つため
+#異なるホストへのリクエストは互いに待たされない
+class HostRateLimiter():
+
+	def __init__(self, rate = 1.0, capacity = 1):
+
+		self.__rate = rate
+		self.__capacity = capacity
+
+		#host -> TokenBucket
+		self.__bucket_dict = {}
+		self.__lock = threading.Lock()
+
+
+	#URLの接続先ホストへのリクエストが許可されるまで待機する
+	def acquire(self, url):
+
+		self.get_bucket(url).acquire()
+
+
+	#acquireの非同期版
+	#待機中もイベントループを止めない
+	async def acquire_async(self, url):
+
+		bucket = self.get_bucket(url)
+
+		while True :
+
+			wait_time = bucket.try_acquire()
+			if wait_time == 0 :
+				return
+
+			await asyncio.sleep(wait_time)
+
+
+	def get_bucket(self, url):
+
+		host = urllib.parse.urlparse(url).netloc
+
+		with self.__lock :
+
+			if host not in self.__bucket_dict :
+				self.__bucket_dict[host] = TokenBucket(self.__rate, self.__capacity)
+
+			return self.__bucket_dict[host]
+
+
+	#制限を変更する
+	#rateは1秒あたりのリクエスト数、capacityは連続して送信できるリクエスト数
+	def set_rate(self, rate, capacity = 1):
+
+		with self.__lock :
+
+			self.__rate = rate
+			self.__capacity = capacity
+			self.__bucket_dict = {}
@@ -0,0 +1,168 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+from .AtomicFile import atomic_write
+
+
+
+#サーバ上のファイルをローカルに保存するキャッシュ
+#
+#ファイル本体は内容のハッシュ値を名前としてgzip圧縮して保存する
+#異なるURLから同じ内容のファイルを取得した場合、本体は1つだけ保存される
+#
+#  <cache_dir>/url/<ハッシュ値の先頭2文字>/<URLのハッシュ値>.json
+#      URL毎の記録(本体のハッシュ値, ETag, Last-Modified, 取得時刻)
+#
+#  <cache_dir>/blob/<ハッシュ値の先頭2文字>/<ハッシュ値の3,4文字目>/<本体のハッシュ値>.gz
+#      ファイル本体
+#
+#1つのディレクトリに大量のファイルが置かれないよう、ハッシュ値の先頭で振り分ける
+#
+#以前の形式(<cache_dir>直下に本体を置く形式)で保存されたファイルは
+#読み込んだ際にこの形式へ移し替える
+class WebCache():
+
+	def __init__(self, cache_dir_path):
+
+		self.__cache_dir_path = cache_dir_path
+
+
+	def get_cache_dir_path(self):
+		return self.__cache_dir_path
+
+
+	def get_record_file_path(self, url):
+
+		url_hash_str = hashlib.sha256(url.encode('utf-8')).hexdigest()
+		return os.path.join(self.__cache_dir_path, 'url', url_hash_str[0:2], url_hash_str + '.json')
+
+
+	def get_blob_file_path(self, content_hash_str):
+
+		return os.path.join(self.__cache_dir_path, 'blob', content_hash_str[0:2], content_hash_str[2:4], content_hash_str + '.gz')
+
+
+	def exists(self, url):
+
+		if os.path.exists(self.get_record_file_path(url)) :
+			return True
+
+		return self.__migrate_legacy_file(url)
+
+
+	def read(self, url):
+
+		meta_dict = self.read_meta(url)
+
+		with gzip.open(self.get_blob_file_path(meta_dict['content_hash']), 'rb') as f :
+
+			return f.read()
+
+
+	def write(self, url, content_data, etag = None, last_modified = None):
+
+		content_hash_str = hashlib.sha256(content_data).hexdigest()
+
+		#同じ内容の本体が既にあれば保存しない
+		blob_file_path = self.get_blob_file_path(content_hash_str)
+		if not os.path.exists(blob_file_path) :
+
+			atomic_write(blob_file_path, gzip.compress(content_data))
+
+		self.__write_meta(url, {'url' : url, \
+					'content_hash' : content_hash_str, \
+					'etag' : etag, \
+					'last_modified' : last_modified, \
+					'fetched_time' : time.time()})
+
+
+	def read_meta(self, url):
+
+		if not self.exists(url) :
+			return None
+
+		with open(self.get_record_file_path(url), 'r', encoding = 'utf-8') as f :
+
+			return json.load(f)
+
+
+	#サーバ上のファイルが変更されていないことを確認した時刻を記録する
+	def touch(self, url):
+
+		meta_dict = self.read_meta(url)
+		meta_dict['fetched_time'] = time.time()
+
+		self.__write_meta(url, meta_dict)
+
+
+	#取得からmax_age秒を超えたキャッシュは再検証が必要
+	#max_ageがNoneなら再検証しない
+	def is_stale(self, url, max_age):
+
+		if max_age == None :
+			return False
+
+		return time.time() - self.read_meta(url)['fetched_time'] > max_age
+
+
+	#条件付きリクエストのヘッダーを生成する
+	def get_conditional_headers(self, url):
+
+		meta_dict = self.read_meta(url)
+
+		headers = {}
+		if meta_dict['etag'] != None :
+			headers['If-None-Match'] = meta_dict['etag']
+
+		if meta_dict['last_modified'] != None :
+			headers['If-Modified-Since'] = meta_dict['last_modified']
+
+		return headers
+
+
+	def __write_meta(self, url, meta_dict):
+
+		atomic_write(self.get_record_file_path(url), json.dumps(meta_dict).encode('utf-8'))
+
+
+	#以前の形式で保存されたファイルがあれば現在の形式で保存し直す
+	#
+	#移し替えたらTrueを返す
+	#以前の形式のファイルは削除しない
+	def __migrate_legacy_file(self, url):
+
+		hash_str = hashlib.sha256(url.encode('utf-8')).hexdigest()
+		legacy_file_path = self.__cache_dir_path + os.sep + 'xml_text_' + url.translate(str.maketrans('/\\.:', '____')) +'_' + hash_str
+
+		if not os.path.exists(legacy_file_path) :
+			return False
+
+
+		with open(legacy_file_path, 'rb') as f :
+
+			content_data = f.read()
+
+
+		#メタデータが無い場合はファイルの更新時刻を取得時刻とみなす
+		legacy_meta_dict = {'etag' : None, \
+					'last_modified' : None, \
+					'fetched_time' : os.path.getmtime(legacy_file_path)}
+
+		if os.path.exists(legacy_file_path + '.meta') :
+
+			with open(legacy_file_path + '.meta', 'r', encoding = 'utf-8') as f :
+
+				legacy_meta_dict = json.load(f)
+
+
+		self.write(url, content_data, legacy_meta_dict['etag'], legacy_meta_dict['last_modified'])
+
+		#取得時刻は以前のファイルのものを引き継ぐ
+		meta_dict = self.read_meta(url)
+		meta_dict['fetched_time'] = legacy_meta_dict['fetched_time']
+		self.__write_meta(url, meta_dict)
+
+		return True
+
@@ -0,0 +1,189 @@
+from .XBRLSchemaIndex import XBRLSchemaIndex, UNPICKLING_EXCEPTIONS
+import os
+import pickle
+import logging
+from .AtomicFile import atomic_write_path
+
+logger = logging.getLogger(__name__)
+
+
+#要素分類表の形式のバージョン
+#形式や分類の判定を変更した場合は値を更新し、古い分類表を読み込まないようにする
+CONCEPT_TABLE_VERSION = 1
+
+
+#タクソノミのスキーマファイルの要素分類表
+#
+#スキーマファイル中の要素について
+#id -> (用途, name, periodType)
+#となる表を作成し、ローカルに保存する
+#
+#分類表はスキーマファイルのURLと内容のハッシュ値(タクソノミの版)で識別するため
+#全ての提出書類・木構造で共有され、タクソノミの版毎に一度だけ作成される
+#提出者の独自要素(ローカルのスキーマファイル)は保存せず、その都度classifyで判定する
+#
+#用途を判定できない要素の用途はNoneとなる
+class XBRLConceptTable():
+
+	#URL -> 要素分類表
+	concept_table_cache = {}
+
+
+	#要素分類表を取得する
+	@classmethod
+	def get_concept_table(cls, schema_url):
+
+		if schema_url in cls.concept_table_cache :
+			return cls.concept_table_cache[schema_url]
+
+
+		content_hash_str = XBRLSchemaIndex.get_content_hash(schema_url)
+		table_file_path = cls.__get_table_file_path(schema_url, content_hash_str)
+
+		concept_table = cls.__load_table_file(table_file_path)
+		if concept_table == None :
+
+			logger.debug('create concept table : ' + schema_url)
+
+			concept_table = cls.__create_concept_table(XBRLSchemaIndex.get_element_table(schema_url))
+			cls.__save_table_file(table_file_path, concept_table)
+
+		else :
+
+			logger.debug('load concept table from cache : ' + table_file_path)
+
+
+		cls.concept_table_cache[schema_url] = concept_table
+
+		return concept_table
+
+
+	@classmethod
+	def clear_cache(cls):
+		cls.concept_table_cache = {}
+
+
+	#要素の属性 (name, type, substitutionGroup, periodType, abstract) から用途を判別する
+	#判別できない場合はNoneを返す
+	@staticmethod
+	def classify(element_attr_tuple):
+
+		tmp_name, tmp_type, tmp_substitutionGroup, tmp_period_type, tmp_abstract = element_attr_tuple
+
+		#nameやtypeが無い要素は判別できない
+		if tmp_name == None or tmp_type == None :
+			return None
+
+		if 'Heading' in tmp_name and tmp_type == 'stringItemType' and tmp_substitutionGroup == 'identifierItem' and tmp_abstract == 'true' :
+			return 'heading'
+
+		elif 'Abstract' in tmp_name  and tmp_type == 'stringItemType' and tmp_substitutionGroup == 'item' and tmp_abstract == 'true' :
+			return 'title'
+
+		elif 'Table' in tmp_name and tmp_type == 'stringItemType' and tmp_substitutionGroup == 'hypercubeItem' and tmp_abstract == 'true' :
+			return 'table'
+
+		elif 'Axis' in tmp_name and tmp_type == 'stringItemType' and tmp_substitutionGroup == 'dimensionItem' and tmp_abstract == 'true' :
+			return 'axis'
+
+		elif 'Member' in tmp_name and tmp_type == 'domainItemType' and tmp_substitutionGroup == 'item' and tmp_abstract == 'true' :
+			return 'member'
+
+		elif 'LineItems' in tmp_name and tmp_type == 'stringItemType' and tmp_substitutionGroup == 'item' and tmp_abstract == 'true' :
+			return 'line_items'
+
+		elif tmp_abstract == 'false' and ( tmp_type == 'monetaryItemType' or \
+							tmp_type == 'perShareItemType' or \
+							tmp_type == 'sharesItemType' or \
+							tmp_type == 'percentItemType' or \
+							tmp_type == 'percentage1ItemType' or \
+							tmp_type == 'percentage2ItemType' or \
+							tmp_type == 'decimalItemType' or \
+							tmp_type == 'nonNegativeIntegerItemType') :
+			return 'number'
+
+		elif tmp_abstract == 'false' and tmp_type.startswith('numberOf') :
+			return 'number'
+
+		elif tmp_abstract == 'false' and ( tmp_type == 'dateItemType') :
+			return 'date'
+
+		elif tmp_abstract == 'false' and ( tmp_type == 'booleanItemType') :
+			return 'bool'
+
+		elif tmp_abstract == 'false' and ( tmp_type == 'anyURIItemType') :
+			return 'uri'
+
+		elif 'TextBlock' in tmp_name and tmp_abstract == 'false' and ( tmp_type == 'textBlockItemType' ) :
+
+			return 'text_block'
+
+		elif tmp_abstract == 'false' and ( tmp_type == 'textBlockItemType' ) :
+
+			return 'text_block'
+
+
+		elif tmp_abstract == 'false' and tmp_type == 'stringItemType' and tmp_substitutionGroup == 'item' :
+
+			return 'text'
+
+		elif tmp_type == 'stringItemType' and tmp_substitutionGroup == 'item' and tmp_abstract == 'true' :
+			return 'title'
+
+		#判定できない
+		return None
+
+
+	@staticmethod
+	def __create_concept_table(element_table):
+
+		concept_table = {}
+
+		for elm_id, element_attr_tuple in element_table.items() :
+
+			concept_table[elm_id] = ( XBRLConceptTable.classify(element_attr_tuple), \
+						element_attr_tuple[0], \
+						element_attr_tuple[3] )
+
+		return concept_table
+
+
+	@staticmethod
+	def __get_table_file_path(schema_url, content_hash_str):
+
+		url_hash_str = XBRLSchemaIndex.get_url_hash(schema_url)
+		return '.' + os.sep + 'schemaindex' + os.sep + 'concept_table_' + url_hash_str + '_' + content_hash_str
+
+
+	@staticmethod
+	def __load_table_file(table_file_path):
+
+		if not os.path.isfile(table_file_path) :
+			return None
+
+		#壊れた分類表ファイルは読み込まず作り直す
+		try :
+
+			with open(table_file_path, 'rb') as f:
+
+				version, concept_table = pickle.load(f)
+
+		except UNPICKLING_EXCEPTIONS :
+
+			logger.warning('broken concept table : ' + table_file_path)
+			return None
+
+		if version != CONCEPT_TABLE_VERSION :
+			return None
+
+		return concept_table
+
+
+	@staticmethod
+	def __save_table_file(table_file_path, concept_table):
+
+		with atomic_write_path(table_file_path) as tmp_file_path :
+
+			with open(tmp_file_path, 'wb') as f:
+
+				pickle.dump((CONCEPT_TABLE_VERSION, concept_table), f)
@@ -0,0 +1,332 @@
+from .XMLDataGetter import XMLDataGetter
+from collections.abc import Mapping
+from urllib.request import pathname2url
+import os
+import sqlite3
+import hashlib
+import json
+import logging
+import threading
+from .AtomicFile import atomic_write, atomic_write_path
+
+logger = logging.getLogger(__name__)
+
+
+#ラベル格納ファイルの形式のバージョン
+#形式や名称リンクベースの読み込み方法を変更した場合は値を更新し、古いファイルを読み込まないようにする
+LABEL_STORE_VERSION = 1
+
+
+#名称リンクベースファイル(日本語)のラベル格納ファイル
+#
+#名称リンクベースファイルのラベルを
+#(出現順, 要素ID, ラベルのロール, 日本語名称)
+#の表としてSQLiteのファイルに保存し、読み取り専用で開く
+#
+#ファイルは名称リンクベースファイルのパスと内容のハッシュ値で識別するため
+#名称リンクベースファイルが変更された場合は別のファイルが作成される
+#ハッシュ値はwebcacheなどに記録したものを用い、プロセス毎に名称リンクベースファイルを読み込まない
+#作成後のファイルは変更しないため、複数のプロセスから同時に開いて検索できる
+#
+#要素ID -> (ラベルのロール -> 日本語名称)
+#の辞書として参照でき、全てのラベルをメモリ上に展開せずに必要な要素のみ検索する
+#同じ要素ID・ロールのラベルが複数ある場合は先に出現したものを用いる
+class XBRLLabelStore(Mapping):
+
+	#名称リンクベースファイル -> 内容のハッシュ値
+	content_hash_cache = {}
+
+
+	def __init__(self, labfile, store_file_path) :
+
+		self.__labfile = labfile
+		self.__store_file_path = store_file_path
+
+		#SQLiteの接続はプロセス毎に開き直す
+		self.__connection = None
+		self.__connection_pid = None
+		self.__lock = threading.Lock()
+
+
+	#ラベル格納ファイルを開く
+	#ファイルが存在しない場合は名称リンクベースファイルを読み込んで作成する
+	@classmethod
+	def open_store(cls, labfile):
+
+		content_hash_str = cls.get_content_hash(labfile)
+		store_file_path = cls.__get_store_file_path(labfile, content_hash_str)
+
+		if cls.__check_store_file(store_file_path, content_hash_str) :
+
+			logger.debug('load label store : ' + store_file_path)
+
+		else :
+
+			logger.debug('create label store : ' + labfile)
+
+			cls.__create_store_file(store_file_path, content_hash_str, cls.__read_label_tuple_list(labfile))
+
+
+		return XBRLLabelStore(labfile, store_file_path)
+
+
+	#名称リンクベースファイルの内容のハッシュ値を取得する
+	#
+	#URLの場合はwebcacheに記録したハッシュ値を用いる
+	#ローカルファイルの場合はサイズと更新時刻が前回と同じなら記録したハッシュ値を用いる
+	#いずれもファイル全体を読み込まずにラベル格納ファイルを探せる
+	@classmethod
+	def get_content_hash(cls, labfile):
+
+		if labfile not in cls.content_hash_cache :
+
+			if labfile.startswith('http') :
+				cls.content_hash_cache[labfile] = XMLDataGetter.get_content_hash(labfile)
+
+			else :
+				cls.content_hash_cache[labfile] = cls.__get_local_content_hash(labfile)
+
+		return cls.content_hash_cache[labfile]
+
+
+	#ローカルの名称リンクベースファイルの内容のハッシュ値を取得する
+	#
+	#計算したハッシュ値はファイルのサイズ・更新時刻とともにラベル格納ファイルと同じ場所に記録する
+	@staticmethod
+	def __get_local_content_hash(labfile):
+
+		stat_result = os.stat(labfile)
+		file_stat_list = [stat_result.st_size, stat_result.st_mtime_ns]
+
+		hash_file_path = XBRLLabelStore.__get_hash_file_path(labfile)
+
+		try :
+
+			with open(hash_file_path, 'r', encoding = 'utf-8') as f :
+				hash_dict = json.load(f)
+
+			if hash_dict['file_stat'] == file_stat_list :
+				return hash_dict['content_hash']
+
+		except (OSError, ValueError, KeyError, TypeError) :
+			pass
+
+
+		content_hash_str = XMLDataGetter.get_content_hash(labfile)
+
+		atomic_write(hash_file_path, json.dumps({'labfile' : labfile, \
+							'file_stat' : file_stat_list, \
+							'content_hash' : content_hash_str}).encode('utf-8'))
+
+		return content_hash_str
+
+
+	@classmethod
+	def clear_cache(cls):
+		cls.content_hash_cache = {}
+
+
+	def get_labfile(self) :
+		return self.__labfile
+
+
+	def get_store_file_path(self) :
+		return self.__store_file_path
+
+
+	#要素IDのラベルのロール -> 日本語名称の辞書を取得する
+	def __getitem__(self, elm_id) :
+
+		role_dict = {}
+
+		for label_role, jp_str in self.__execute('SELECT role, jp_str FROM labels WHERE id = ? ORDER BY seq', (elm_id,)) :
+
+			if label_role not in role_dict :
+				role_dict[label_role] = jp_str
+
+		if len(role_dict) == 0 :
+			raise KeyError(elm_id)
+
+		return role_dict
+
+
+	def __iter__(self) :
+
+		for row in self.__execute('SELECT DISTINCT id FROM labels ORDER BY id') :
+			yield row[0]
+
+
+	def __len__(self) :
+		return self.__execute('SELECT COUNT(DISTINCT id) FROM labels')[0][0]
+
+
+	def __contains__(self, elm_id) :
+		return len(self.__execute('SELECT 1 FROM labels WHERE id = ? LIMIT 1', (elm_id,))) != 0
+
+
+	#全てのラベルを(要素ID, ラベルのロール, 日本語名称)のリストとして出現順に取得する
+	def get_label_tuple_list(self) :
+		return self.__execute('SELECT id, role, jp_str FROM labels ORDER BY seq')
+
+
+	def close(self) :
+
+		with self.__lock :
+
+			if self.__connection != None and self.__connection_pid == os.getpid() :
+				self.__connection.close()
+
+			self.__connection = None
+			self.__connection_pid = None
+
+
+	#プロセスの間で共有するのはファイルのみとし、接続は共有しない
+	def __getstate__(self) :
+		return (self.__labfile, self.__store_file_path)
+
+
+	def __setstate__(self, state) :
+		self.__init__(*state)
+
+
+	def __execute(self, sql, parameters = ()) :
+
+		with self.__lock :
+
+			#fork後の子プロセスでは親プロセスの接続を用いず開き直す
+			if self.__connection == None or self.__connection_pid != os.getpid() :
+
+				self.__connection = XBRLLabelStore.__connect_read_only(self.__store_file_path)
+				self.__connection_pid = os.getpid()
+
+			return self.__connection.execute(sql, parameters).fetchall()
+
+
+	@staticmethod
+	def __connect_read_only(store_file_path):
+
+		#作成後のファイルは変更されないため、immutableを指定してロックを取らずに読み込む
+		uri = 'file:' + pathname2url(os.path.abspath(store_file_path)) + '?mode=ro&immutable=1'
+		return sqlite3.connect(uri, uri = True, check_same_thread = False)
+
+
+	@staticmethod
+	def __get_store_file_path(labfile, content_hash_str):
+
+		path_hash_str = hashlib.sha256(labfile.encode('utf-8')).hexdigest()
+		return '.' + os.sep + 'labelstore' + os.sep + 'label_store_' + path_hash_str + '_' + content_hash_str + '.sqlite'
+
+
+	@staticmethod
+	def __get_hash_file_path(labfile):
+
+		path_hash_str = hashlib.sha256(labfile.encode('utf-8')).hexdigest()
+		return '.' + os.sep + 'labelstore' + os.sep + 'label_hash_' + path_hash_str + '.json'
+
+
+	#ラベル格納ファイルが利用可能か確認する
+	@staticmethod
+	def __check_store_file(store_file_path, content_hash_str):
+
+		if not os.path.isfile(store_file_path) :
+			return False
+
+		try :
+
+			connection = XBRLLabelStore.__connect_read_only(store_file_path)
+
+			try :
+				meta_dict = dict(connection.execute('SELECT key, value FROM meta').fetchall())
+			finally :
+				connection.close()
+
+		except sqlite3.DatabaseError :
+
+			logger.warning('broken label store : ' + store_file_path)
+			return False
+
+
+		if meta_dict.get('version') != str(LABEL_STORE_VERSION) :
+			return False
+
+		if meta_dict.get('content_hash') != content_hash_str :
+			return False
+
+		return True
+
+
+	@staticmethod
+	def __create_store_file(store_file_path, content_hash_str, label_tuple_list):
+
+		with atomic_write_path(store_file_path) as tmp_file_path :
+
+			connection = sqlite3.connect(tmp_file_path)
+
+			try :
+
+				connection.execute('PRAGMA journal_mode = OFF')
+				connection.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+				connection.execute('CREATE TABLE labels (seq INTEGER PRIMARY KEY, id TEXT NOT NULL, role TEXT, jp_str TEXT)')
+
+				connection.executemany('INSERT INTO meta (key, value) VALUES (?, ?)', \
+							[('version', str(LABEL_STORE_VERSION)), ('content_hash', content_hash_str)])
+				connection.executemany('INSERT INTO labels (id, role, jp_str) VALUES (?, ?, ?)', label_tuple_list)
+
+				connection.execute('CREATE INDEX labels_id ON labels (id)')
+				connection.commit()
+
+			finally :
+				connection.close()
+
+
+	#名称リンクベースファイルを読み込み
+	#(要素ID, ラベルのロール, 日本語名称)のリストを出現順に取得する
+	@staticmethod
+	def __read_label_tuple_list(labfile):
+
+		#loc要素 -> labelArc要素 -> label要素 の対応を辞書で結合する
+		#文書全体の木構造は作らず、要素を逐次読み込む
+		loc_list = list()
+
+		#labelArcのfrom -> toのリスト(出現順)
+		label_arc_dict = {}
+
+		#labelのラベル -> (ロール, 日本語名称)のリスト(出現順)
+		label_dict = {}
+
+		bdata = XMLDataGetter.get_bytes(labfile)
+		for elm in XMLDataGetter.get_parser_backend().iter_elements(bdata, ['loc', 'labelArc', 'label']) :
+
+			local_name = elm.get_local_name()
+
+			if local_name == 'loc' :
+
+				#loc要素から要素IDに対応するラベルを辿るためのリンク名称を取得する
+				elm_href =  elm.get('xlink:href')
+				loc_list.append((elm_href.split('#')[-1], elm.get('xlink:label')))
+
+			elif local_name == 'labelArc' :
+
+				label_arc_dict.setdefault(elm.get('xlink:from'), list()).append(elm.get('xlink:to'))
+
+			else :
+
+				jp_label = str(elm.get_string())
+				label_role = elm.get('xlink:role')
+
+				label_dict.setdefault(elm.get('xlink:label'), list()).append((label_role, jp_label))
+
+
+		#リンク名からIDにリンクされているラベルを取得する
+		label_tuple_list = list()
+
+		for elm_id, link_name in loc_list :
+
+			for label_id in label_arc_dict.get(link_name, list()) :
+
+				for label_role, jp_label in label_dict.get(label_id, list()) :
+
+					label_tuple_list.append((elm_id, label_role, jp_label))
+
+
+		return label_tuple_list
@@ -0,0 +1,164 @@
+from .XMLDataGetter import XMLDataGetter
+import os
+import pickle
+import hashlib
+import logging
+from .AtomicFile import atomic_write_path
+
+logger = logging.getLogger(__name__)
+
+
+#索引ファイルの形式のバージョン
+#形式を変更した場合は値を更新し、古い索引ファイルを読み込まないようにする
+SCHEMA_INDEX_VERSION = 1
+
+#壊れた・途中までしか書き込まれていないpickleファイルを読み込んだ際に発生する例外
+UNPICKLING_EXCEPTIONS = (EOFError, pickle.UnpicklingError, AttributeError, ImportError, IndexError, TypeError, ValueError)
+
+
+#スキーマファイルの要素索引
+#
+#スキーマファイル中の要素について
+#id -> (name, type, substitutionGroup, periodType, abstract)
+#となる表を作成し、ローカルに保存する
+#
+#索引ファイルはURLとファイル内容のハッシュ値で識別するため
+#スキーマファイルが更新された場合は作り直される
+#一度作成した索引ファイルがあればスキーマファイルのXMLは解析しない
+class XBRLSchemaIndex():
+
+	#URL -> 要素索引
+	element_table_cache = {}
+
+	#URL -> スキーマファイルの内容のハッシュ値
+	content_hash_cache = {}
+
+
+	#要素索引を取得する
+	@classmethod
+	def get_element_table(cls, schema_url):
+
+		if schema_url in cls.element_table_cache :
+			return cls.element_table_cache[schema_url]
+
+
+		bdata = XMLDataGetter.get_bytes(schema_url)
+		content_hash_str = hashlib.sha256(bdata).hexdigest()
+		cls.content_hash_cache[schema_url] = content_hash_str
+
+		index_file_path = cls.__get_index_file_path(schema_url, content_hash_str)
+
+		element_table = cls.__load_index_file(index_file_path)
+		if element_table == None :
+
+			logger.debug('create schema index from xml : ' + schema_url)
+
+			element_table = cls.__create_element_table(bdata)
+			cls.__save_index_file(index_file_path, element_table)
+
+		else :
+
+			logger.debug('load schema index from cache : ' + index_file_path)
+
+
+		cls.element_table_cache[schema_url] = element_table
+
+		return element_table
+
+
+	#スキーマファイルの内容のハッシュ値を取得する
+	#スキーマファイルの版を識別するために用いる
+	@classmethod
+	def get_content_hash(cls, schema_url):
+
+		if schema_url not in cls.content_hash_cache :
+			cls.content_hash_cache[schema_url] = hashlib.sha256(XMLDataGetter.get_bytes(schema_url)).hexdigest()
+
+		return cls.content_hash_cache[schema_url]
+
+
+	@classmethod
+	def clear_cache(cls):
+		cls.element_table_cache = {}
+		cls.content_hash_cache = {}
+
+
+	#スキーマファイルを逐次解析し要素索引を作成する
+	@staticmethod
+	def __create_element_table(bdata):
+
+		element_table = {}
+
+		for elm in XMLDataGetter.get_parser_backend().iter_elements(bdata, ['element']) :
+
+			elm_id = elm.get('id')
+			if elm_id == None :
+				continue
+
+			#abstractが設定されていない場合はfalseと判断
+			tmp_abstract = XBRLSchemaIndex.__remove_prefix(elm.get('abstract'))
+			if tmp_abstract == None :
+				tmp_abstract = 'false'
+
+			element_table[elm_id] = ( XBRLSchemaIndex.__remove_prefix(elm.get('name')), \
+						XBRLSchemaIndex.__remove_prefix(elm.get('type')), \
+						XBRLSchemaIndex.__remove_prefix(elm.get('substitutionGroup')), \
+						XBRLSchemaIndex.__remove_prefix(elm.get('xbrli:periodType')), \
+						tmp_abstract )
+
+		return element_table
+
+
+	@staticmethod
+	def __remove_prefix(value_str):
+
+		if value_str == None :
+			return None
+
+		return value_str.split(':')[-1]
+
+
+	@staticmethod
+	def get_url_hash(schema_url):
+		return hashlib.sha256(schema_url.encode('utf-8')).hexdigest()
+
+
+	@staticmethod
+	def __get_index_file_path(schema_url, content_hash_str):
+
+		url_hash_str = XBRLSchemaIndex.get_url_hash(schema_url)
+		return '.' + os.sep + 'schemaindex' + os.sep + 'schema_index_' + url_hash_str + '_' + content_hash_str
+
+
+	@staticmethod
+	def __load_index_file(index_file_path):
+
+		if not os.path.isfile(index_file_path) :
+			return None
+
+		#壊れた索引ファイルは読み込まず作り直す
+		try :
+
+			with open(index_file_path, 'rb') as f:
+
+				version, element_table = pickle.load(f)
+
+		except UNPICKLING_EXCEPTIONS :
+
+			logger.warning('broken schema index : ' + index_file_path)
+			return None
+
+		if version != SCHEMA_INDEX_VERSION :
+			return None
+
+		return element_table
+
+
+	@staticmethod
+	def __save_index_file(index_file_path, element_table):
+
+		with atomic_write_path(index_file_path) as tmp_file_path :
+
+			with open(tmp_file_path, 'wb') as f:
+
+				pickle.dump((SCHEMA_INDEX_VERSION, element_table), f)
@@ -1,18 +1,30 @@
 from .XMLDataGetter import XMLDataGetter
+from .XBRLSchemaIndex import XBRLSchemaIndex
+from .XBRLConceptTable import XBRLConceptTable
+from .XBRLLabelStore import XBRLLabelStore
 from .JPXError import JPXAnalysisError
 import os
+import sys
 import pickle
 import copy
-from bs4 import BeautifulSoup
 import hashlib
+from .AtomicFile import atomic_write_path
+import threading
+import bisect
 import logging
 from abc import ABCMeta, abstractmethod
+from collections import deque
 
 
 
 logger = logging.getLogger(__name__)
 
 
+#木構造のスナップショットファイルの形式のバージョン
+#形式やノードの属性を変更した場合は値を更新し、古いスナップショットを読み込まないようにする
+TREE_SNAPSHOT_VERSION = 2
+
+
 class IterableTree(metaclass=ABCMeta):
 
 
@@ -23,151 +35,106 @@ class IterableTree(metaclass=ABCMeta):
 
 
 	#イテレーターを実装
-
-
-	#巡回情報スタックへのアクセスは全てこれらの関数郡で行う
-
-	def get_top_walk_info(self):
-
-		if len(self.walk_info_stack) == 0 :
-			return None
-
-
-		else :
-			return self.walk_info_stack[-1]
-
-	def pop_walk_info(self) :
-		if len(self.walk_info_stack) == 0 :
-			return None
-
-		else :
-			return self.walk_info_stack.pop()
-
-
-	def append_walk_info(self, walk_info) :
-		self.walk_info_stack.append(walk_info)
-
+	#
+	#巡回状態は木構造ではなくジェネレーターの中に保持する
+	#このため巡回を入れ子にしたり、複数のスレッドから同時に巡回しても互いに影響しない
 
 
 	#巡回状況を初期化する
 	#デフォルトはルート
 	def init_walking_status(self) :
-		self.walk_info_stack = list()
-		self.walk_info_stack.append(WalkInfo(self.get_root_node()))
+		self.walking_root = None
 
 
 	#与えられたノードをルートとして巡回する
+	#
+	#次のfor文(__iter__)一回分のみ有効で、その後はルートからの巡回に戻る
+	#新しいコードではwalkにノードを直接渡すこと
 	def set_walking_root(self, node) :
-		self.walk_info_stack = list()
-		self.walk_info_stack.append(WalkInfo(node))
+		self.walking_root = node
 
 
 
 	#イテレータのインターフェース関数
 	def __iter__(self):
 
-		return self
+		walking_root = self.walking_root
+		self.init_walking_status()
 
-	#イテレータのインターフェース関数
-	def __next__(self):
+		if walking_root == None :
+			walking_root = self.get_root_node()
 
-		return self.walk_next_node()
+		return self.walk(walking_root)
 
 
-	#次の要素に巡回する
-	#
-	#巡回情報スタックに応じて動作する
+	#与えられたノードをルートとする部分木を巡回するジェネレーター
 	#
-	#スタックの最上位の要素を巡回していく
-	#子要素がある時はスタックし、親要素に戻るときはポップする
-	#スタックが空になった時が巡回を終了するべき時である
+	#子ノードは追加時に順序の昇順に並べられているため、巡回中にはソートしない
 	#
-	#スタックの一番底が巡回対象となる木構造のルートとなっている
-	#部分木のみ巡回したければ、このスタックの一番底を部分木のルートにしておけばよい
+	#order
+	# 'pre'   親、子の順(子は順序の昇順)
+	# 'post'  子、親の順
+	# 'level' 深さの浅い順
 	#
-	#
-	#巡回先の決定アルゴリズム
-	#
-	#1.巡回情報スタックが空なら巡回を終える
-	#  巡回を終える際はスタックに次に巡回する木構造の
-	#  最上位ノード情報のみがある状態にしておく
-	#
-	#2.スタックの最上位が未巡回ならそこを巡回する
-	#
-	#3.スタックの最上位の子要素を巡回する
-	#  子要素を巡回する際はスタックに子要素ノードの情報を積み
-	#　再度1から処理を継続する
-	#
-	#4.子要素を巡回しきったら、親要素を巡回する
-	#  親要素を巡回する際はスタックをポップし
-	#　再度1から処理を継続する
-	#
-	def walk_next_node(self):
-
-		#巡回情報が空なら巡回は完了している	
-		top_walk_info = self.get_top_walk_info()
-		if top_walk_info == None :
-			self.end_walking()
+	#再帰を用いず、巡回中に木構造を変更しない
+	def walk(self, node = None, order = 'pre'):
 
+		if node == None :
+			node = self.get_root_node()
 
-		#自身を巡回してないなら自身を巡回する
-		if top_walk_info.current_node_returned == False :
-			top_walk_info.current_node_returned = True
-			return top_walk_info.current_node	
 
+		if order == 'pre' :
 
-		#いまのノードにとって子ノードの巡回がはじめてなら
-		#子ノードの巡回情報の初期化が必要
-		if top_walk_info.last_returned_child_index == -1 and len(top_walk_info.current_node.get_children()) != 0 :
-			top_walk_info.number_of_children =  len(top_walk_info.current_node.get_children())
+			stack = [node]
+			while len(stack) != 0 :
 
-			#初回だけ子ノードのソートを実施する
-			top_walk_info.current_node.get_children().sort()
+				current_node = stack.pop()
+				yield current_node
 
+				stack.extend(reversed(current_node.get_children()))
 
-		#いま巡回する子ノードのインデックスは前回巡回した子ノードのインデックスの次である
-		child_index = top_walk_info.last_returned_child_index + 1
 
+		elif order == 'post' :
 
-		#最後の子ノードを巡回済みであれば親の巡回を再開する
-		if top_walk_info.number_of_children <=  child_index :
-			self.pop_walk_info()
-			return self.walk_next_node()	
+			#(ノード, 子を積み終えたか)
+			stack = [(node, False)]
+			while len(stack) != 0 :
 
+				current_node, children_pushed = stack.pop()
+				if children_pushed == True :
 
-		#子ノードを巡回する
-		top_walk_info.last_returned_child_index = top_walk_info.last_returned_child_index + 1
-		self.append_walk_info(WalkInfo(top_walk_info.current_node.get_children()[child_index]))	
-		return self.walk_next_node()
+					yield current_node
+					continue
 
+				stack.append((current_node, True))
+				for child in reversed(current_node.get_children()) :
+					stack.append((child, False))
 
-		#ここに到達することはあり得ない
 
+		elif order == 'level' :
 
-	#巡回を終了する
-	def end_walking(self) :
-		self.init_walking_status()
-		raise StopIteration()
-
+			queue = deque([node])
+			while len(queue) != 0 :
 
+				current_node = queue.popleft()
+				yield current_node
 
-#巡回情報
-class WalkInfo():
+				queue.extend(current_node.get_children())
 
-	def __init__(self, current_node):
-		self.current_node = current_node
 
-		#自身を巡回済みか否か
-		self.current_node_returned = False
+		else :
+			raise ValueError('unknown walk order:' + str(order))
 
-		#子ノードの巡回状況を保持
-		self.last_returned_child_index = -1 
-		self.number_of_children = 0
 
 
 #IterableTreeを構成するノード
+#
+#get_childrenは順序の昇順に並んだリストを返すこと
 class IterableNode(metaclass=ABCMeta):
 
+	#派生クラスで__slots__を使えるよう、__dict__を持たない
+	__slots__ = ()
+
 
 	@abstractmethod
 	def get_children(self) :
@@ -189,7 +156,9 @@ class IterableNode(metaclass=ABCMeta):
 #リンクベースファイルのツリー構造を保存する
 class XBRLLinkBaseTree(IterableTree) :
 
-	def __init__(self, load_file_kind, xbrl_path_data) :
+	#lazyがTrueなら、大項目の一覧のみ読み込み
+	#各大項目の木構造は巡回・検索で初めて参照された時に構築する
+	def __init__(self, load_file_kind, xbrl_path_data, lazy = False) :
 
 		self.__root_node = None
 		self.__rol_list = list()
@@ -197,14 +166,35 @@ class XBRLLinkBaseTree(IterableTree) :
 
 		self.__load_file_kind = load_file_kind
 
+		#id -> ノードのリスト(巡回順)
+		#同じ要素が複数の大項目や複数の位置に現れるためリストで保持する
+		self.__node_index_dict = {}
+
+		#大項目のid -> (id -> ノードのリスト(巡回順))
+		self.__rol_node_index_dict = {}
+
+		#大項目のid -> 大項目のノード
+		self.__rol_node_dict = {}
+
+		#構築待ちの大項目のノード -> definitionLinkなどの要素
+		self.__pending_rol_dict = {}
+		self.__build_lock = threading.RLock()
+
+		#読み込み済みの(処理名, rol_id)
+		#スナップショットから復元した木構造で同じ読み込み処理を繰り返さないために用いる
+		self.__annotated_set = set()
+
+		#最後に保存・復元したスナップショットの__annotated_set
+		#スナップショットと対応していなければNone
+		self.__snapshot_annotated_set = None
+
 
 		#データの読み込みに成功しようがどうだろうがルートだけは用意しておく
 		self.set_root_node(XBRLStructureNode('document_root', 'root'))
 		self.get_root_node().set_href('root')
 
 
-		#木構造巡回のための復帰情報を詰んでおくためのスタック
-		#通常はルートから巡回を開始する
+		#for文による巡回は通常はルートから開始する
 		self.init_walking_status() 
 
 
@@ -228,8 +218,12 @@ class XBRLLinkBaseTree(IterableTree) :
 
 
 		#親子関係読み込み後のhref取得に用いる
-		roleRef_elems = soup.select('roleRef')
-		loc_elems = soup.select('loc')	
+		#roleURI -> href
+		#loc要素のラベル -> hrefは大項目の構築時に作成する
+		roleRef_href_dict = self.__get_roleRef_href_dict(soup)
+
+		self.__soup = soup
+		self.__loc_href_dict = None
 
 
 		#まずはリンク構造(親子関係)を読み込み木構造を生成する
@@ -248,20 +242,21 @@ class XBRLLinkBaseTree(IterableTree) :
 			link_tag_name = 'calculationLink'
 
 
-		ark_tag_name = None
+		self.__ark_tag_name = None
 		if load_file_kind == 'definition' :
 
-			ark_tag_name = 'definitionArc'
+			self.__ark_tag_name = 'definitionArc'
 
 		elif load_file_kind == 'presentation' :
 
-			ark_tag_name = 'presentationArc'
+			self.__ark_tag_name = 'presentationArc'
 
 		elif load_file_kind == 'calculation' :
 
-			ark_tag_name = 'calculationArc'
+			self.__ark_tag_name = 'calculationArc'
 
-		#definitionLinkまたはpresentationLinkごとに構造を取得する
+		#definitionLinkまたはpresentationLinkごとに大項目のノードを生成する
+		#大項目の中身は__build_pending_rolで構築する
 		document_number = 0
 		for primary_item in soup.select(f'{link_tag_name}'):
 
@@ -274,253 +269,588 @@ class XBRLLinkBaseTree(IterableTree) :
 			#rol listを生成
 			self.get_rol_list().append( primary_item_name.split('/')[-1] )
 
-			logger.debug(f'load {link_tag_name} role = ' + primary_item_name)
+			logger.debug(f'index {link_tag_name} role = ' + primary_item_name)
 
 
 			#大項目のhref属性を設定
-			for elem in roleRef_elems :
-				if elem.get('roleURI') == sub_root_node.get_label_in_linkbase() :
-					sub_root_node.set_href(elem.get('xlink:href') )
-					break
+			if sub_root_node.get_label_in_linkbase() in roleRef_href_dict :
+				sub_root_node.set_href(roleRef_href_dict[sub_root_node.get_label_in_linkbase()])
 
 
 			self.get_root_node().append_child(sub_root_node, document_number)
 
+			#大項目のid -> 大項目のノード
+			#同じ大項目が複数ある場合はsearch_nodeと同様に後のものを用いる
+			self.__rol_node_dict[sub_root_node.get_id()] = sub_root_node
 
-			#各要素を保存するための辞書
-			tree_dict = {}
+			#構築待ちの大項目のノード -> definitionLinkなどの要素
+			self.__pending_rol_dict[sub_root_node] = primary_item
 
 
-			#各要素の親子関係を取得し保存する
-			for elem in primary_item.select(f'{ark_tag_name}'):
+		#ルートと大項目のみの索引を作成しておく
+		self.__build_node_index()
 
-				parent_name = elem.get('xlink:from')
-				child_name = elem.get('xlink:to')
-				order_str = elem.get('order')
-				weight_str = elem.get('weight')
+		#遅延構築しない場合は全ての大項目をここで構築する
+		if lazy == False :
+			self.__build_pending_rol()
 
-				arcrole_str = elem.get('xlink:arcrole')
-				preferred_label = elem.get('preferredLabel')
 
+	#構築待ちの大項目を構築する
+	#
+	#rol_nodeを指定した場合はその大項目のみ、Noneなら全ての大項目を構築する
+	#複数のスレッドから呼び出されても一度だけ構築する
+	def __build_pending_rol(self, rol_node = None):
 
-				order = None
-				if order_str != None :
-					order = float(order_str)
+		if len(self.__pending_rol_dict) == 0 :
+			return
 
-				weight = None
-				if weight_str != None :
-					weight = float(weight_str)
+		if rol_node != None and rol_node not in self.__pending_rol_dict :
+			return
 
 
-				parent = None
-				child = None
+		with self.__build_lock :
 
+			if rol_node == None :
+				rol_node_list = list(self.__pending_rol_dict.keys())
 
-				if parent_name not in tree_dict:
-					parent = XBRLStructureNode(parent_name, 'content')
-					tree_dict[parent_name] = parent
-				else :
-					parent = tree_dict[parent_name]
+			elif rol_node in self.__pending_rol_dict :
+				rol_node_list = [rol_node]
 
+			else :
+				rol_node_list = list()
 
-				if child_name not in tree_dict:
-					child = XBRLStructureNode(child_name, 'content')
-					tree_dict[child_name] = child
-				else :
-					child = tree_dict[child_name]
 
+			for target_rol_node in rol_node_list :
 
-				#ディメンションデフォルトは親子関係ではないため
-				#親子関係を設定しない
-				if arcrole_str == 'http://xbrl.org/int/dim/arcrole/dimension-default' :
+				if self.__loc_href_dict == None :
+					self.__loc_href_dict = self.__get_loc_href_dict(self.__soup)
 
-					child.set_dimension_default_flag(True)
+				logger.debug('build role = ' + str(target_rol_node.get_label_in_linkbase()))
 
+				self.__build_rol(target_rol_node, self.__pending_rol_dict[target_rol_node])
 
-				#他の関係については親子関係を設定する
-				else :
+				if self.get_load_file_kind() == 'presentation' :
 
-					parent.append_child(child, order)
-					child.set_parent(parent)
+					#優先ラベルを設定する
+					self.__set_preferred_label(target_rol_node, None)
 
 
-				#優先ラベルが設定されているなら設定する
-				if preferred_label != None :
-					child.set_preferred_label(preferred_label)
+				#大項目の索引を作成し、全体の索引は次に必要になった時に作り直す
+				if self.__rol_node_dict.get(target_rol_node.get_id()) is target_rol_node :
+					self.__rol_node_index_dict[target_rol_node.get_id()] = XBRLLinkBaseTree.__get_rol_node_index_dict(target_rol_node)
 
+				self.__node_index_dict = None
 
-				#重みが設定されているなら設定する
-				if weight != None :
+				del self.__pending_rol_dict[target_rol_node]
 
-					child.set_weight(weight)
 
+			#全て構築したら解析結果は不要
+			if len(self.__pending_rol_dict) == 0 :
 
-			#root以外に要素がないならすることがないので次へ
-			if len(tree_dict) == 0 :
+				self.__soup = None
+				self.__loc_href_dict = None
 
-				continue
 
-			#親子関係を読み込めたら、各項目のhref属性を設定する(idも設定する)
-			for key in tree_dict.keys():
+	#大項目の木構造を構築する
+	def __build_rol(self, sub_root_node, primary_item):
 
-				node = tree_dict[key]
+		#各要素を保存するための辞書
+		tree_dict = {}
 
-				for elem in loc_elems :
-					if elem.get('xlink:label') == node.get_label_in_linkbase() :
 
-						#loc要素の中にはhref要素のURIがローカルファイルのケースが存在する
-						#(提出者の独自要素の場合)
-						#この場合はhrefの値を参照可能なパスに修正する
-						tmp_href = elem.get('xlink:href')
-						if not tmp_href.startswith('http') :
-							tmp_href = os.path.join(self.get_xbrl_path_data().get_xbrl_dir_path(), tmp_href)
+		#各要素の親子関係を取得し保存する
+		for elem in primary_item.select(f'{self.__ark_tag_name}'):
 
+			parent_name = elem.get('xlink:from')
+			child_name = elem.get('xlink:to')
+			order_str = elem.get('order')
+			weight_str = elem.get('weight')
+
+			arcrole_str = elem.get('xlink:arcrole')
+			preferred_label = elem.get('preferredLabel')
 
-						node.set_href(tmp_href)
-						break
 
+			order = None
+			if order_str != None :
+				order = float(order_str)
 
-			#ディメンションデフォルトの設定
+			weight = None
+			if weight_str != None :
+				weight = float(weight_str)
 
-			#ディメンションデフォルトである要素のIDを取得
-			dimension_default_elm_id_list = list()
-			del_key_list = list()
-			for key in tree_dict.keys():
 
-				node = tree_dict[key]
+			parent = None
+			child = None
 
-				if node.get_dimension_default_flag() == True :
 
-					dimension_default_elm_id_list.append(node.get_id())
-					del_key_list.append(key)
+			if parent_name not in tree_dict:
+				parent = XBRLStructureNode(parent_name, 'content')
+				tree_dict[parent_name] = parent
+			else :
+				parent = tree_dict[parent_name]
 
-			#そのIDの要素をディメンションデフォルトに設定
-			for key in tree_dict.keys():
 
-				node = tree_dict[key]
+			if child_name not in tree_dict:
+				child = XBRLStructureNode(child_name, 'content')
+				tree_dict[child_name] = child
+			else :
+				child = tree_dict[child_name]
 
-				if node.get_id() in dimension_default_elm_id_list :
 
-					node.set_dimension_default_flag(True)
+			#ディメンションデフォルトは親子関係ではないため
+			#親子関係を設定しない
+			if arcrole_str == 'http://xbrl.org/int/dim/arcrole/dimension-default' :
 
-			#はじめに読み込んだディメンションデフォルトは親子関係が設定されていない
-			#孤立した要素であり、後の処理に影響するため
-			#削除する
-			for del_key in del_key_list :
+				child.set_dimension_default_flag(True)
 
-				del tree_dict[del_key]
 
+			#他の関係については親子関係を設定する
+			#親無しノードの挿入先はリンクベースファイル中の出現順で探すため
+			#子ノードは挿入後に並べ替える
+			else :
 
+				parent.append_child_unsorted(child, order)
+				child.set_parent(parent)
 
 
-			#保存結果には親が設定されていないノードが存在するため、ここで設定する
-			no_parent_node_list = list()
-			for key in tree_dict.keys():
-				current_node = tree_dict[key]
+			#優先ラベルが設定されているなら設定する
+			if preferred_label != None :
+				child.set_preferred_label(preferred_label)
 
-				if current_node.get_parent() == None :
-					no_parent_node_list.append(current_node)
 
+			#重みが設定されているなら設定する
+			if weight != None :
 
-			#Headingノードを探す
-			heading_node_list = list()
-			for heading_node_candidate in no_parent_node_list :
+				child.set_weight(weight)
 
-				#ルートとなるノードは他の親無しノードの子としては存在していない
-				node_is_heading = True
-				for no_parent_node in no_parent_node_list :
 
-					#自身は飛ばす
-					if heading_node_candidate == no_parent_node :
-						continue
+		#root以外に要素がないならすることがないので終える
+		if len(tree_dict) == 0 :
 
-					#他の親無しノードの子として存在していたら、ルートノードではない
-					result_tuple = XBRLLinkBaseTree.search_node_that_have_target_id_child(no_parent_node, heading_node_candidate.get_id())
-					if result_tuple[0] != None :
-						node_is_heading = False
-						break
+			return
 
-				if node_is_heading == True :
-					heading_node_list.append(heading_node_candidate)
+		#親子関係を読み込めたら、各項目のhref属性を設定する(idも設定する)
+		for key in tree_dict.keys():
 
+			node = tree_dict[key]
 
-			#Headingノードが見つからない
-			if len(heading_node_list) == 0 :
-				raise JPXAnalysisError('heading node is not exists')
+			if node.get_label_in_linkbase() in self.__loc_href_dict :
+				node.set_href(self.__loc_href_dict[node.get_label_in_linkbase()])
 
 
-			#Headingノード毎にノードの再構成処理を実施
-			order = 0
-			for heading_node in heading_node_list :
+		#ディメンションデフォルトの設定
 
-				order = order + 1
+		#ディメンションデフォルトである要素のIDを取得
+		dimension_default_elm_id_list = list()
+		del_key_list = list()
+		for key in tree_dict.keys():
 
-				sub_root_node.append_child(heading_node, order)
-				no_parent_node_list.remove(heading_node)
+			node = tree_dict[key]
 
+			if node.get_dimension_default_flag() == True :
 
-				#Headingノード以外の親無しを処理する
-				while True :
+				dimension_default_elm_id_list.append(node.get_id())
+				del_key_list.append(key)
 
-					#Headingから辿って、子に親無しを持つノードを探す
+		#そのIDの要素をディメンションデフォルトに設定
+		for key in tree_dict.keys():
 
-					#(node, child_index)
-					result_tuple = (None, -1)
-					source_node = None
-					for no_parent_node in no_parent_node_list :
+			node = tree_dict[key]
 
-						result_tuple = XBRLLinkBaseTree.search_node_that_have_target_id_child(heading_node, no_parent_node.get_id())
-						if result_tuple[0] != None :
-							source_node = no_parent_node
-							break
+			if node.get_id() in dimension_default_elm_id_list :
 
-					#Headingノードの中に他の親無しノードが存在しなくなるまで処理を実施したら
-					#このHeadingノードに関する再構成処理を終える
-					if result_tuple[0] == None :
-						break
+				node.set_dimension_default_flag(True)
+
+		#はじめに読み込んだディメンションデフォルトは親子関係が設定されていない
+		#孤立した要素であり、後の処理に影響するため
+		#削除する
+		for del_key in del_key_list :
+
+			del tree_dict[del_key]
+
+
+
+
+		#保存結果には親が設定されていないノードが存在するため、ここで設定する
+		no_parent_node_list = list()
+		for key in tree_dict.keys():
+			current_node = tree_dict[key]
+
+			if current_node.get_parent() == None :
+				no_parent_node_list.append(current_node)
+
+
+		#Headingノードを探す
+		heading_node_list = XBRLLinkBaseTree.__get_heading_node_list(no_parent_node_list)
+
+
+		#Headingノードが見つからない
+		if len(heading_node_list) == 0 :
+			raise JPXAnalysisError('heading node is not exists')
+
+
+		#Headingノード毎にノードの再構成処理を実施
+		no_parent_node_list = [node for node in no_parent_node_list if node not in heading_node_list]
+
+		order = 0
+		for heading_node in heading_node_list :
+
+			order = order + 1
+
+			sub_root_node.append_child(heading_node, order)
+
+		XBRLLinkBaseTree.__attach_no_parent_node(heading_node_list, no_parent_node_list)
+
+		XBRLLinkBaseTree.__sort_all_children(heading_node_list)
+
+
+	#id -> ノードのリストとなる索引を作成する
+	#
+	#木構造を巡回順に一度だけ辿り
+	#全体の索引と大項目毎の索引を作成する
+	def __build_node_index(self):
+
+		node_index_dict = {}
+		self.__rol_node_index_dict = {}
+
+		root_node = self.get_root_node()
+		node_index_dict.setdefault(root_node.get_id(), list()).append(root_node)
+
+		for rol_node in root_node.get_children() :
+
+			rol_node_index_dict = XBRLLinkBaseTree.__get_rol_node_index_dict(rol_node)
+
+			for id, node_list in rol_node_index_dict.items() :
+				node_index_dict.setdefault(id, list()).extend(node_list)
+
+			#同じ大項目が複数ある場合はsearch_nodeと同様に後のものを用いる
+			self.__rol_node_index_dict[rol_node.get_id()] = rol_node_index_dict
+
+		self.__node_index_dict = node_index_dict
+
+
+	#大項目内のid -> ノードのリスト(巡回順)となる索引を作成する
+	@staticmethod
+	def __get_rol_node_index_dict(rol_node):
+
+		rol_node_index_dict = {}
+
+		stack = [rol_node]
+		while len(stack) != 0 :
+
+			node = stack.pop()
+
+			rol_node_index_dict.setdefault(node.get_id(), list()).append(node)
+
+			stack.extend(reversed(node.get_children()))
+
+		return rol_node_index_dict
+
+
+	#親無しノードの中からHeadingノードを探す
+	#
+	#Headingノードは他の親無しノードの子孫としては存在していない
+	#親無しノード毎に子孫のidを一度だけ調べ
+	#id -> そのidを子孫に持つ親無しノードのリスト
+	#となる辞書を作り判定する
+	@staticmethod
+	def __get_heading_node_list(no_parent_node_list):
+
+		no_parent_nodes_by_child_id = {}
+
+		for no_parent_node in no_parent_node_list :
+
+			stack = list(no_parent_node.get_children())
+			while len(stack) != 0 :
+
+				node = stack.pop()
+
+				node_list = no_parent_nodes_by_child_id.setdefault(node.get_id(), list())
+				if len(node_list) == 0 or node_list[-1] is not no_parent_node :
+					node_list.append(no_parent_node)
+
+				stack.extend(node.get_children())
+
+
+		heading_node_list = list()
+		for heading_node_candidate in no_parent_node_list :
+
+			#自身以外の親無しノードの子孫として存在していたら、Headingノードではない
+			node_is_heading = True
+			for no_parent_node in no_parent_nodes_by_child_id.get(heading_node_candidate.get_id(), list()) :
+
+				if no_parent_node is not heading_node_candidate :
+					node_is_heading = False
+					break
+
+			if node_is_heading == True :
+				heading_node_list.append(heading_node_candidate)
+
+		return heading_node_list
+
+
+	#Headingノード以外の親無しノードを木構造に挿入する
+	#
+	#Headingから辿って、親無しノードと同じidを持つ子ノードを親無しノードで置き換える
+	#挿入した親無しノードの子孫にも他の親無しノードの挿入先があるため
+	#挿入できる親無しノードが無くなるまで繰り返す
+	#
+	#挿入する親無しノードと挿入先は次の順で決める
+	#  親無しノードは出現順で最初に挿入先が見つかったもの
+	#  挿入先は、Headingから辿ったノードの子を先頭から調べ、最初に見つかったもの
+	#既に挿入した親無しノードと同じidの親無しノードは、その位置を置き換える
+	#
+	#1回の挿入毎に木構造を1度だけ辿るため、親無しノードの数 x ノード数 の処理量となる
+	@staticmethod
+	def __attach_no_parent_node(heading_node_list, no_parent_node_list):
+
+		for heading_node in heading_node_list :
+
+			while len(no_parent_node_list) != 0 :
+
+				#id -> そのidを持つ最初の親無しノードの位置
+				no_parent_index_dict = {}
+				for no_parent_index, no_parent_node in enumerate(no_parent_node_list) :
+					no_parent_index_dict.setdefault(no_parent_node.get_id(), no_parent_index)
+
+
+				#挿入先を探す
+				#(親無しノードの位置, 挿入先のノード, 子ノードの位置)
+				result_tuple = (len(no_parent_node_list), None, -1)
+
+				stack = [heading_node]
+				while len(stack) != 0 and result_tuple[0] != 0 :
+
+					node = stack.pop()
+					children = node.get_children()
+
+					for child_index, child in enumerate(children) :
+
+						no_parent_index = no_parent_index_dict.get(child.get_id())
+						if no_parent_index != None and no_parent_index < result_tuple[0] :
+							result_tuple = (no_parent_index, node, child_index)
+
+					stack.extend(reversed(children))
+
+
+				#Headingノードの中に他の親無しノードが存在しなくなるまで処理を実施したら
+				#このHeadingノードに関する再構成処理を終える
+				no_parent_index, node_that_have_target_label_child, child_index = result_tuple
+				if node_that_have_target_label_child == None :
+					break
+
+
+				source_node = no_parent_node_list.pop(no_parent_index)
+				children = node_that_have_target_label_child.get_children()
+				child = children[child_index]
+
+				#デフォルトディメンションフラグと順序、優先ラベルは親無しには絶対設定されていない
+				#したがって、挿入先のものを使用する
+				source_node.set_order(child.get_order())
+				source_node.set_dimension_default_flag(child.get_dimension_default_flag())
+				source_node.set_parent(child.get_parent())
+				source_node.set_preferred_label(child.get_preferred_label())
+
+				#親無しを挿入する
+				children[child_index] = source_node
+
+
+		if len(no_parent_node_list) != 0 :
+			raise JPXAnalysisError('親無しノードが余りました')
+
+
+	#Headingノード以下の全てのノードの子ノードを順序の昇順に並べ替える
+	#同じ順序の子ノードは追加した順に並ぶ
+	@staticmethod
+	def __sort_all_children(heading_node_list):
+
+		sorted_node_set = set()
+
+		stack = list(heading_node_list)
+		while len(stack) != 0 :
+
+			node = stack.pop()
+			if id(node) in sorted_node_set :
+				continue
+
+			sorted_node_set.add(id(node))
 
+			node.sort_children()
+			stack.extend(node.get_children())
 
-					node_that_have_target_label_child = result_tuple[0]
-					child_index = result_tuple[1]
 
+	#roleURI -> hrefとなる辞書を生成する
+	#同じroleURIが複数ある場合は先に出現したものを用いる
+	@staticmethod
+	def __get_roleRef_href_dict(soup):
+
+		roleRef_href_dict = {}
+
+		for elem in soup.select('roleRef') :
+
+			role_uri = elem.get('roleURI')
+			if role_uri not in roleRef_href_dict :
+				roleRef_href_dict[role_uri] = elem.get('xlink:href')
 
-					#デフォルトディメンションフラグと順序、優先ラベルは親無しには絶対設定されていない
-					#したがって、挿入先のものを使用する
-					source_node.set_order(node_that_have_target_label_child.get_children()[child_index].get_order())
-					source_node.set_dimension_default_flag(node_that_have_target_label_child.get_children()[child_index].get_dimension_default_flag())
-					source_node.set_parent(node_that_have_target_label_child.get_children()[child_index].get_parent())
-					source_node.set_preferred_label(node_that_have_target_label_child.get_children()[child_index].get_preferred_label())
+		return roleRef_href_dict
 
-					#親無しを挿入する
-					node_that_have_target_label_child.get_children()[child_index] = source_node
 
-					no_parent_node_list.remove(source_node)
+	#loc要素のラベル -> hrefとなる辞書を生成する
+	#同じラベルが複数ある場合は先に出現したものを用いる
+	def __get_loc_href_dict(self, soup):
 
-			if len(no_parent_node_list) != 0 :
-				raise JPXAnalysisError('親無しノードが余りました')
+		loc_href_dict = {}
 
+		for elem in soup.select('loc') :
 
-		if load_file_kind == 'presentation' :
+			loc_label = elem.get('xlink:label')
+			if loc_label in loc_href_dict :
+				continue
+
+			#loc要素の中にはhref要素のURIがローカルファイルのケースが存在する
+			#(提出者の独自要素の場合)
+			#この場合はhrefの値を参照可能なパスに修正する
+			tmp_href = elem.get('xlink:href')
+			if not tmp_href.startswith('http') :
+				tmp_href = os.path.join(self.get_xbrl_path_data().get_xbrl_dir_path(), tmp_href)
 
-			#優先ラベルを設定する
-			self.__set_preferred_label(self.get_root_node(), None)
+			loc_href_dict[loc_label] = tmp_href
+
+		return loc_href_dict
 
 
 	#優先ラベル情報を設定する
+	#
+	#親の優先ラベルが設定されており、設定対象の優先ラベルが設定されていない場合のみ
+	#設定対象のノードの優先ラベルを設定する
 	def __set_preferred_label(self, target_node, parent_preferred_label):
 
-		#親の優先ラベルが設定されており、設定対象の優先ラベルが設定されていない場合のみ
-		#設定対象のノードの優先ラベルを設定する
+		stack = [(target_node, parent_preferred_label)]
+		while len(stack) != 0 :
+
+			node, parent_preferred_label = stack.pop()
+
+			if node.get_preferred_label() == None and parent_preferred_label != None :
+
+				node.set_preferred_label(parent_preferred_label)
+
+
+			for child in node.get_children() :
+				stack.append((child, node.get_preferred_label()))
+
+
+	#スナップショットには巡回状態やロックを含めない
+	#未構築の大項目は保存前に構築する
+	def __getstate__(self):
 
-		if target_node.get_preferred_label() == None and parent_preferred_label != None :
+		self.__build_pending_rol()
 
-			target_node.set_preferred_label(parent_preferred_label)
+		state = self.__dict__.copy()
+		state['walking_root'] = None
+		del state['_XBRLLinkBaseTree__build_lock']
 
+		return state
 
-		for child in target_node.get_children() :
-			self.__set_preferred_label(child, target_node.get_preferred_label())
+	def __setstate__(self, state):
 
+		self.__dict__.update(state)
+		self.__build_lock = threading.RLock()
+
+
+	#読み込み・注釈済みの木構造をスナップショットとして保存する
+	#
+	#スナップショットはリンクベースファイル、提出者のスキーマファイル、名称リンクベースファイルの
+	#内容のハッシュ値で識別するため、いずれかが更新された場合は使われなくなる
+	#インスタンス文書から読み込んだ値は保存しない(XBRLStructureNode.__getstate__で除く)
+	def save_snapshot(self):
+
+		snapshot_file_path = XBRLLinkBaseTree.__get_snapshot_file_path(self.get_load_file_kind(), self.get_xbrl_path_data())
+
+		with atomic_write_path(snapshot_file_path) as tmp_file_path :
+
+			with open(tmp_file_path, 'wb') as f:
+
+				pickle.dump((TREE_SNAPSHOT_VERSION, self), f, protocol = pickle.HIGHEST_PROTOCOL)
+
+		self.__snapshot_annotated_set = frozenset(self.__annotated_set)
+
+		logger.debug('save tree snapshot : ' + snapshot_file_path)
+
+		return snapshot_file_path
+
+
+	#スナップショットから木構造を復元する
+	#スナップショットが無ければNoneを返す
+	@classmethod
+	def load_snapshot(cls, load_file_kind, xbrl_path_data):
+
+		snapshot_file_path = XBRLLinkBaseTree.__get_snapshot_file_path(load_file_kind, xbrl_path_data)
+		if not os.path.isfile(snapshot_file_path) :
+			return None
 
+		with open(snapshot_file_path, 'rb') as f:
+
+			version, tree = pickle.load(f)
+
+		if version != TREE_SNAPSHOT_VERSION or not isinstance(tree, cls) :
+			return None
+
+		logger.debug('load tree snapshot : ' + snapshot_file_path)
+
+
+		tree.__xbrl_path_data = xbrl_path_data
+		tree.__snapshot_annotated_set = frozenset(tree.__annotated_set)
+
+		return tree
+
+
+	#スナップショットがあれば復元し、無ければリンクベースファイルから読み込む
+	#lazyはリンクベースファイルから読み込む場合に用いる
+	@classmethod
+	def load(cls, load_file_kind, xbrl_path_data, lazy = False):
+
+		tree = cls.load_snapshot(load_file_kind, xbrl_path_data)
+		if tree == None :
+			tree = cls(load_file_kind, xbrl_path_data, lazy)
+
+		return tree
+
+
+	#スナップショットを保存していない、または保存・復元した後に注釈を付けた大項目があるならTrue
+	def is_snapshot_stale(self):
+		return self.__snapshot_annotated_set != self.__annotated_set
+
+
+	@staticmethod
+	def __get_snapshot_file_path(load_file_kind, xbrl_path_data):
+
+		if load_file_kind == 'definition' :
+
+			load_file_path = xbrl_path_data.get_def_file_path()
+
+		elif load_file_kind == 'presentation' :
+
+			load_file_path = xbrl_path_data.get_pre_file_path()
+
+		else :
+
+			load_file_path = xbrl_path_data.get_cal_file_path()
+
+
+		key_str = str(TREE_SNAPSHOT_VERSION) + '\n' + load_file_kind + '\n' + xbrl_path_data.get_xbrl_dir_path()
+
+		for file_path in (load_file_path, xbrl_path_data.get_xsd_file_path(), xbrl_path_data.get_lab_file_path()) :
+
+			content_hash_str = ''
+			if os.path.isfile(file_path) :
+				content_hash_str = hashlib.sha256(XMLDataGetter.get_bytes(file_path)).hexdigest()
+
+			key_str = key_str + '\n' + content_hash_str
+
+
+		key_hash_str = hashlib.sha256(key_str.encode('utf-8')).hexdigest()
+
+		return '.' + os.sep + 'treecache' + os.sep + 'tree_' + load_file_kind + '_' + key_hash_str
 
 
 	def get_root_node(self) :
@@ -534,16 +864,73 @@ class XBRLLinkBaseTree(IterableTree) :
 
 
 	#ノードを検索する
+	#同じidのノードが複数ある場合は巡回順で最後のものを返す
+	#
+	#大項目のidを指定した場合はその大項目のみ構築する
 	def search_node(self, id) :
 
-		result = None
+		#ルートを指定した場合は全ての大項目を構築する
+		if id == self.get_root_node().get_id() :
+
+			self.__build_pending_rol()
+			return self.get_root_node()
+
+		if id in self.__rol_node_dict :
+
+			rol_node = self.__rol_node_dict[id]
+			self.__build_pending_rol(rol_node)
+
+			return rol_node
+
+
+		node_list = self.__get_node_index_dict().get(id)
+		if node_list == None :
+			return None
+
+		return node_list[-1]
+
+
+	#同じidのノードを全て取得する(巡回順)
+	#rol_idを指定した場合はその大項目内のノードのみ取得する
+	def search_node_list(self, id, rol_id = None) :
+
+		if rol_id == None :
+			return list(self.__get_node_index_dict().get(id, list()))
+
+		self.__build_pending_rol(self.__rol_node_dict.get(rol_id))
+
+		return list(self.__rol_node_index_dict.get(rol_id, {}).get(id, list()))
+
+
+	#全体の索引を取得する
+	#未構築の大項目があれば全て構築し、索引が古ければ作り直す
+	def __get_node_index_dict(self):
+
+		self.__build_pending_rol()
+
+		node_index_dict = self.__node_index_dict
+		if node_index_dict == None :
+
+			with self.__build_lock :
+
+				if self.__node_index_dict == None :
+					self.__build_node_index()
+
+				node_index_dict = self.__node_index_dict
 
-		for elm in self :
+		return node_index_dict
 
-			if elm.get_id() == id :
-				result = elm
 
-		return result
+	#巡回前に巡回範囲の大項目を構築する
+	def walk(self, node = None, order = 'pre'):
+
+		if node == None or node is self.get_root_node() :
+			self.__build_pending_rol()
+
+		else :
+			self.__build_pending_rol(node)
+
+		return super().walk(node, order)
 
 	def get_load_file_kind(self) :
 
@@ -576,7 +963,6 @@ class XBRLLinkBaseTree(IterableTree) :
 
 		tree_structure_list.append('     '*depth + str(root_node))
 
-		root_node.get_children().sort()
 		for child in root_node.get_children() :
 			self.__get_all_node_text(child, depth + 1,tree_structure_list)
 
@@ -607,7 +993,6 @@ class XBRLLinkBaseTree(IterableTree) :
 		elif show_dest == 'terminal' :
 			print('     '*depth + str(root_node))
 
-		root_node.get_children().sort()
 		for child in root_node.get_children() :
 			self.__print_all_node(child, depth + 1,show_dest)
 
@@ -645,154 +1030,193 @@ class XBRLLinkBaseTree(IterableTree) :
 		return None, -1
 
 
-	#xsdファイルの読み込み
-	def read_xsd_file(self, rol_id) :
+	#大項目の各ノードに注釈を付ける
+	#
+	#スキーマファイルの属性(read_xsd)、日本語名称(read_jp_lab)、
+	#ディメンションデフォルト(def_linkbase_tree)、優先ラベル(pre_tree)を
+	#大項目の木構造を一度だけ辿って設定する
+	#
+	#各ノードにはスキーマファイル、日本語名称、ディメンションデフォルト、優先ラベルの順に設定するため
+	#個別のメソッドをこの順に呼び出した場合と同じ結果になる
+	#
+	#concept_info_dictを渡した場合は、要素毎のスキーマファイルの属性と日本語名称をこの辞書に保存し
+	#同じ辞書を渡した他の大項目や木構造ではその値を再利用する
+	def annotate_role(self, rol_id, read_xsd = True, read_jp_lab = True, def_linkbase_tree = None, pre_tree = None, concept_info_dict = None) :
 
 		#存在しないrolを指定された場合は処理しない
 		if rol_id not in self.get_rol_list() :
 			return
 
 
-		#木構造巡回のルートを設定する
-		self.set_walking_root(self.search_node(rol_id))
+		#読み込み済み(スナップショットから復元した場合など)の処理は行わない
+		if ('xsd', rol_id) in self.__annotated_set :
+			read_xsd = False
 
+		if ('jp_lab', rol_id) in self.__annotated_set :
+			read_jp_lab = False
 
-		#xsdファイルを検索し、各ノードの詳細情報から用途を調べる
-		for node in self :
 
-			if node == None :
-				
-				raise JPXAnalysisError('木構造巡回エラー: ' + rol_id + ' ノードがNone')
+		#定義リンクベースからしかディメンションデフォルト情報は取得できない
+		#定義リンクベースファイルに該当する大項目がなければ
+		#ディメンションデフォルトとなるメンバーも当然存在しない
+		if def_linkbase_tree != None :
 
-			#role要素は処理しない
-			if node.get_node_kind() == 'document_name' :
-				continue
+			if def_linkbase_tree.get_load_file_kind() != 'definition' or rol_id not in def_linkbase_tree.get_rol_list() :
+				def_linkbase_tree = None
 
-			soup = XMLDataGetter.get(node.get_xsd_uri() )
-			if soup == None :
 
-				raise JPXAnalysisError('スキーマファイルが存在しない:' + node.get_xsd_uri())
+		#表示リンクベースからしか優先ラベル情報は取得できない
+		#表示リンクベースファイルに該当する大項目がなければ
+		#優先ラベル情報は取得できない
+		preferred_label_dict = None
+		if pre_tree != None :
 
+			if pre_tree.get_load_file_kind() == 'presentation' and rol_id in pre_tree.get_rol_list() :
 
-			detail_elm = soup.select_one('#' + node.get_id() )
-			if detail_elm == None :
+				#表示リンクベースファイルからid : preferred_labelとなる辞書を生成する
+				preferred_label_dict = {}
 
-				raise JPXAnalysisError('スキーマファイルに該当要素無し:' + node.get_href())
+				for pre_node in pre_tree.walk(pre_tree.search_node(rol_id)) :
 
+					preferred_label_dict[pre_node.get_id()] = pre_node.get_preferred_label()
 
-			#必要な属性を取得
-			tmp_name = detail_elm.get('name').split(':')[-1]
-			tmp_period_type = detail_elm.get('xbrli:periodType').split(':')[-1]
-			tmp_type = detail_elm.get('type').split(':')[-1]
-			tmp_substitutionGroup = detail_elm.get('substitutionGroup').split(':')[-1]
 
+		if read_xsd == False and read_jp_lab == False and def_linkbase_tree == None and preferred_label_dict == None :
+			return
 
-			#abstractが設定されていない場合はfalseと判断
-			#暫定
-			if detail_elm.get('abstract') == None :
-				tmp_abstract = 'false'
-			else :
-				tmp_abstract = detail_elm.get('abstract').split(':')[-1]
 
+		#木構造巡回のルートを設定する
+		rol_node = self.search_node(rol_id)
+		if rol_node == None :
+
+			raise JPXAnalysisError('木構造巡回エラー: ' + rol_id + ' ノードがNone')
 
-			#属性の値から用途を判別
-			if 'Heading' in tmp_name and tmp_type == 'stringItemType' and tmp_substitutionGroup == 'identifierItem' and tmp_abstract == 'true' :
-				node.set_usage('heading')
 
-			elif 'Abstract' in tmp_name  and tmp_type == 'stringItemType' and tmp_substitutionGroup == 'item' and tmp_abstract == 'true' :
-				node.set_usage('title')
+		#名称リンクベースファイル（日本語)を読み込む
+		if read_jp_lab == True :
 
-			elif 'Table' in tmp_name and tmp_type == 'stringItemType' and tmp_substitutionGroup == 'hypercubeItem' and tmp_abstract == 'true' :
-				node.set_usage('table')
+			labfile_label_dicts = NameLinkBaseAnalysis.get_JPNameLabelDict(self.get_xbrl_path_data())
+			labfile_list = NameLinkBaseAnalysis.get_JPNameLinkBaseList(self.get_xbrl_path_data())
 
-			elif 'Axis' in tmp_name and tmp_type == 'stringItemType' and tmp_substitutionGroup == 'dimensionItem' and tmp_abstract == 'true' :
-				node.set_usage('axis')
+			#スキーマファイルのURI -> 名称リンクベースファイルのラベル辞書
+			label_dict_cache = {}
 
-			elif 'Member' in tmp_name and tmp_type == 'domainItemType' and tmp_substitutionGroup == 'item' and tmp_abstract == 'true' :
-				node.set_usage('member')
 
-			elif 'LineItems' in tmp_name and tmp_type == 'stringItemType' and tmp_substitutionGroup == 'item' and tmp_abstract == 'true' :
-				node.set_usage('line_items')
+		for node in self.walk(rol_node) :
 
-			elif tmp_abstract == 'false' and ( tmp_type == 'monetaryItemType' or \
-								tmp_type == 'perShareItemType' or \
-								tmp_type == 'sharesItemType' or \
-								tmp_type == 'percentItemType' or \
-								tmp_type == 'percentage1ItemType' or \
-								tmp_type == 'percentage2ItemType' or \
-								tmp_type == 'decimalItemType' or \
-								tmp_type == 'nonNegativeIntegerItemType') :
-				node.set_usage('number')
+			#role要素はスキーマファイル・名称リンクベースファイルを処理しない
+			if node.get_node_kind() != 'document_name' :
 
-			elif tmp_abstract == 'false' and tmp_type.startswith('numberOf') :
-				node.set_usage('number')
+				if read_xsd == True :
+					XBRLLinkBaseTree.__annotate_xsd(node, concept_info_dict)
 
-			elif tmp_abstract == 'false' and ( tmp_type == 'dateItemType') :
-				node.set_usage('date')
+				if read_jp_lab == True :
+					XBRLLinkBaseTree.__annotate_jp_label(node, labfile_label_dicts, labfile_list, label_dict_cache, concept_info_dict)
 
-			elif tmp_abstract == 'false' and ( tmp_type == 'booleanItemType') :
-				node.set_usage('bool')
 
-			elif tmp_abstract == 'false' and ( tmp_type == 'anyURIItemType') :
-				node.set_usage('uri')
+			#メンバー要素について、定義リンクベースファイルの大項目に
+			#同じidのディメンションデフォルトとなるノードが存在するなら
+			#メンバー要素をディメンションデフォルトに設定する
+			if def_linkbase_tree != None and node.get_usage() == 'member' :
 
-			elif 'TextBlock' in tmp_name and tmp_abstract == 'false' and ( tmp_type == 'textBlockItemType' ) :
+				for def_linkbase_node in def_linkbase_tree.search_node_list(node.get_id(), rol_id) :
 
-				node.set_usage('text_block')
+					if def_linkbase_node.get_dimension_default_flag() == True :
 
-			elif tmp_abstract == 'false' and ( tmp_type == 'textBlockItemType' ) :
+						node.set_dimension_default_flag(True)
+						break
 
-				node.set_usage('text_block')
 
+			#自身に優先ラベルを設定する
+			if preferred_label_dict != None :
 
-			elif tmp_abstract == 'false' and tmp_type == 'stringItemType' and tmp_substitutionGroup == 'item' :
+				node.set_preferred_label(preferred_label_dict[node.get_id()])
 
-				node.set_usage('text')
 
-			elif tmp_type == 'stringItemType' and tmp_substitutionGroup == 'item' and tmp_abstract == 'true' :
-				node.set_usage('title')
+		if read_xsd == True :
+			self.__annotated_set.add(('xsd', rol_id))
 
-			else :
-				raise JPXAnalysisError('要素用途の判定結果例外:'+detail_elm.prettify())
-				#node.set_usage(detail_elm.prettify())
+		if read_jp_lab == True :
+			self.__annotated_set.add(('jp_lab', rol_id))
 
-			node.set_name(tmp_name)
-			node.set_period_type(tmp_period_type)
 
+	#要素分類表を調査し、ノードの用途・名称・区間種別を設定する
+	@staticmethod
+	def __annotate_xsd(node, concept_info_dict = None) :
 
+		#他の木構造などで調査済みの要素
+		concept_info_key = ('xsd', node.get_href())
+		if concept_info_dict != None and concept_info_key in concept_info_dict :
 
-	#名称リンクベースファイル(日本語)を読み込み、各ノードの日本語名称を取得する
-	def read_jp_lab_file(self, rol_id) :
+			usage, name, period_type = concept_info_dict[concept_info_key]
+
+			node.set_usage(usage)
+			node.set_name(name)
+			node.set_period_type(period_type)
 
-		#存在しないrolを指定された場合は処理しない
-		if rol_id not in self.get_rol_list() :
 			return
 
 
-		#木構造巡回のルートを設定する
-		self.set_walking_root(self.search_node(rol_id))
+		#タクソノミの要素は版毎に作成済みの分類表から取得する
+		#提出者の独自要素はスキーマファイルの要素索引から属性を取得し、その場で判別する
+		schema_url = node.get_xsd_uri()
+		if schema_url.startswith('http') :
 
+			concept_attr_tuple = XBRLConceptTable.get_concept_table(schema_url).get(node.get_id())
+			if concept_attr_tuple == None :
 
+				raise JPXAnalysisError('スキーマファイルに該当要素無し:' + node.get_href())
 
-		#名称リンクベースファイル（日本語)を読み込む
-		labfile_structure_dicts = NameLinkBaseAnalysis.get_JPNameStructureDict(self.get_xbrl_path_data())
+		else :
 
+			element_table = XBRLSchemaIndex.get_element_table(schema_url)
+			if element_table == None :
 
+				raise JPXAnalysisError('スキーマファイルが存在しない:' + schema_url)
 
-		#各ノードの日本語名称を設定する
-		labfile_list = NameLinkBaseAnalysis.get_JPNameLinkBaseList(self.get_xbrl_path_data())
-		for node in self :
 
-			#role要素は処理しない
-			if node.get_node_kind() == 'document_name' :
-				continue
+			element_attr_tuple = element_table.get(node.get_id())
+			if element_attr_tuple == None :
 
+				raise JPXAnalysisError('スキーマファイルに該当要素無し:' + node.get_href())
 
+			concept_attr_tuple = (XBRLConceptTable.classify(element_attr_tuple), element_attr_tuple[0], element_attr_tuple[3])
 
-			#要素のスキーマファイルのURIから参照するべき名称リンクベースを取得する
-			targeted_labfile = None
 
-			schema_url = node.get_xsd_uri()
+		tmp_usage, tmp_name, tmp_period_type = concept_attr_tuple
+		if tmp_usage == None :
+
+			element_attr_tuple = XBRLSchemaIndex.get_element_table(schema_url).get(node.get_id())
+			raise JPXAnalysisError('要素用途の判定結果例外:' + node.get_id() + str(element_attr_tuple))
+
+
+		node.set_usage(tmp_usage)
+		node.set_name(tmp_name)
+		node.set_period_type(tmp_period_type)
+
+		if concept_info_dict != None :
+			concept_info_dict[concept_info_key] = (node.get_usage(), node.get_name(), node.get_period_type())
+
+
+	#名称リンクベースファイル(日本語)を調査し、ノードの日本語名称を設定する
+	@staticmethod
+	def __annotate_jp_label(node, labfile_label_dicts, labfile_list, label_dict_cache, concept_info_dict = None) :
+
+		#他の木構造などで調査済みの要素
+		concept_info_key = ('jp_lab', node.get_href(), node.get_using_role())
+		if concept_info_dict != None and concept_info_key in concept_info_dict :
+
+			node.set_jp_label(concept_info_dict[concept_info_key])
+			return
+
+
+		#要素のスキーマファイルのURIから参照するべき名称リンクベースを取得する
+		schema_url = node.get_xsd_uri()
+
+		label_dict = label_dict_cache.get(schema_url)
+		if label_dict == None :
+
+			targeted_labfile = None
 
 			if schema_url.startswith('http') :
 				sep = '/'
@@ -816,31 +1240,39 @@ class XBRLLinkBaseTree(IterableTree) :
 				raise JPXAnalysisError('ノードに対応する名称リンクベースファイルを発見できませんでした:' + schema_url)
 
 
-			#名称リンクベースファイルに対応するレコードリストを取得する
-			label_records = labfile_structure_dicts[targeted_labfile]
+			#名称リンクベースファイルに対応するラベル辞書を取得する
+			label_dict = labfile_label_dicts[targeted_labfile]
+			label_dict_cache[schema_url] = label_dict
 
 
-			#レコードリストを検索する
-			jp_str = None
+		#ラベル辞書を検索する
+		#デフォルトは標準ラベルを用いる
+		jp_str = None
 
-			for record in label_records :
+		role_dict = label_dict.get(node.get_id())
+		if role_dict != None :
 
-				if node.get_id() == record.id and record.role == node.get_using_role() :
+			jp_str = role_dict.get(node.get_using_role())
+			if jp_str == None :
+				jp_str = role_dict.get('http://www.xbrl.org/2003/role/label')
 
-					jp_str = record.jp_str
-					break
 
+		node.set_jp_label(jp_str)
 
-			#デフォルトは標準ラベルを用いる
-			if jp_str == None :
-				for record in label_records :
-					if node.get_id() == record.id and record.role == 'http://www.xbrl.org/2003/role/label' :
+		if concept_info_dict != None :
+			concept_info_dict[concept_info_key] = jp_str
 
-						jp_str = record.jp_str
-						break
 
+	#xsdファイルの読み込み
+	def read_xsd_file(self, rol_id) :
 
-			node.set_jp_label(jp_str)
+		self.annotate_role(rol_id, read_xsd = True, read_jp_lab = False)
+
+
+	#名称リンクベースファイル(日本語)を読み込み、各ノードの日本語名称を取得する
+	def read_jp_lab_file(self, rol_id) :
+
+		self.annotate_role(rol_id, read_xsd = False, read_jp_lab = True)
 
 	#既に値を読み込み済みのツリーから値を読み込む
 	def read_instance_data_from_another_tree(self, another_tree, rol_id) :
@@ -860,8 +1292,7 @@ class XBRLLinkBaseTree(IterableTree) :
 		xbrl_data_dict = {}
 
 		another_tree_rol_node = another_tree.search_node(rol_id)
-		another_tree.set_walking_root(another_tree_rol_node)
-		for another_node in another_tree :
+		for another_node in another_tree.walk(another_tree_rol_node) :
 
 			node_id = another_node.get_id()
 			xbrl_data = another_node.get_xbrl_data()
@@ -871,8 +1302,7 @@ class XBRLLinkBaseTree(IterableTree) :
 
 		#自身のノードにxbrl_dataを設定する
 		self_tree_rol_node = self.search_node(rol_id)
-		self.set_walking_root(self_tree_rol_node)
-		for self_node in self :
+		for self_node in self.walk(self_tree_rol_node) :
 
 			node_id = self_node.get_id()
 			self_node.set_xbrl_data(xbrl_data_dict[node_id])
@@ -882,100 +1312,13 @@ class XBRLLinkBaseTree(IterableTree) :
 	#表示リンクベースファイルから優先ラベル情報を取得する
 	def set_preferred_label(self, pre_tree, rol_id) :
 
-		#表示リンクベースからしか優先ラベル情報は取得できない
-		if pre_tree.get_load_file_kind() != 'presentation' :
-			return
-
-		#存在しないrolを指定された場合は処理しない
-		if rol_id not in self.get_rol_list() :
-			return
-
-
-		#表示リンクベースファイルに該当する大項目がなければ
-		#優先ラベル情報は取得できない
-		if rol_id not in pre_tree.get_rol_list() :
-
-			return
-
-
-		#表示リンクベースファイルからid : preferred_labelとなる辞書を生成する
-		preferred_label_dict = {}
-
-		view_linkbase_rol_node = pre_tree.search_node(rol_id)
-		pre_tree.set_walking_root(view_linkbase_rol_node)
-		for pre_node in pre_tree :
-
-			node_id = pre_node.get_id()
-			node_preferred_label = pre_node.get_preferred_label()
-
-			preferred_label_dict[node_id] = node_preferred_label
-
-
-		#自身に優先ラベルを設定する
-		def_linkbase_rol_node = self.search_node(rol_id)
-		self.set_walking_root(def_linkbase_rol_node)
-		for target_node in self :
-
-			target_node.set_preferred_label(preferred_label_dict[target_node.get_id()])
+		self.annotate_role(rol_id, read_xsd = False, read_jp_lab = False, pre_tree = pre_tree)
 
 
 	#ディメンジョンデフォルト情報を設定する
 	def set_dimension_default(self, def_linkbase_tree, rol_id) :
 
-		#定義リンクベースからしか優先ラベル情報は取得できない
-		if def_linkbase_tree.get_load_file_kind() != 'definition' :
-			return
-
-
-		#存在しないrolを指定された場合は処理しない
-		if rol_id not in self.get_rol_list() :
-			return
-
-		#定義リンクベースファイルに該当する大項目がなければ
-		#ディメンションデフォルトとなるメンバーも当然存在しない
-		if rol_id not in def_linkbase_tree.get_rol_list() :
-
-			return
-
-
-		#メンバー要素毎に処理する
-		view_linkbase_rol_node = self.search_node(rol_id)
-		self.set_walking_root(view_linkbase_rol_node)
-		for target_node in self :
-
-			#メンバー以外は処理しない
-			if target_node.get_usage() != 'member' :
-				continue
-
-
-			#定義リンクベースファイルの大項目から
-			#同じidとなるノードを探す
-			def_linkbase_node_list = list()
-
-			def_linkbase_rol_node = def_linkbase_tree.search_node(rol_id)
-			def_linkbase_tree.set_walking_root(def_linkbase_rol_node)
-			for def_linkbase_node in def_linkbase_tree :
-
-				if def_linkbase_node.get_id() == target_node.get_id() :
-
-					def_linkbase_node_list.append(def_linkbase_node)
-
-
-
-			#見つかったノードにディメンションデフォルトとなるノードが存在するか
-			dimension_default_node_is_exist = False
-			for def_linkbase_node in def_linkbase_node_list :
-
-				if def_linkbase_node.get_dimension_default_flag() == True :
-
-					dimension_default_node_is_exist = True
-					break
-
-
-			#存在するならメンバー要素をディメンションデフォルトに設定する
-			if dimension_default_node_is_exist == True :
-
-				target_node.set_dimension_default_flag(True)
+		self.annotate_role(rol_id, read_xsd = False, read_jp_lab = False, def_linkbase_tree = def_linkbase_tree)
 
 
 	#特定の大項目内のtable構造を取得する
@@ -992,8 +1335,7 @@ class XBRLLinkBaseTree(IterableTree) :
 
 		#軸要素を探す
 		axis_node_list = list()
-		self.set_walking_root(self.search_node(rol_id))
-		for node in self :
+		for node in self.walk(self.search_node(rol_id)) :
 
 			if node.get_usage() == 'axis' :
 
@@ -1005,8 +1347,7 @@ class XBRLLinkBaseTree(IterableTree) :
 
 			member_node_list = list()
 
-			self.set_walking_root(axis_node)
-			for node in self :
+			for node in self.walk(axis_node) :
 
 				if node.get_usage() == 'member' :
 
@@ -1150,8 +1491,7 @@ class XBRLLinkBaseTree(IterableTree) :
 
 
 		#各要素ごとにコンテキストの選別を行い、コンテキスト毎のデータを取得する
-		self.set_walking_root(self.search_node(rol_id))
-		for node in self :
+		for node in self.walk(self.search_node(rol_id)) :
 
 
 			#要素が数値、日時、テキストブロック、テキストである場合のみ処理を行う
@@ -1186,9 +1526,181 @@ class XBRLLinkBaseTree(IterableTree) :
 
 
 
+#提出書類の表示・定義・計算リンクベースファイルの木構造をまとめて読み込む
+#
+#参照するタクソノミのファイルを先読みし、3つの木構造を生成した後
+#大項目毎に以下の順で注釈を付け、木構造同士を関連付ける
+#
+#  表示リンクベース  スキーマファイル・日本語名称・ディメンションデフォルト(定義リンクベースから)
+#  定義リンクベース  スキーマファイル・日本語名称
+#  計算リンクベース  スキーマファイル・日本語名称・ディメンションデフォルト・優先ラベル(表示リンクベースから)
+#
+#要素毎のスキーマファイルの属性と日本語名称は3つの木構造で共有し、一度だけ調べる
+#リンクベースファイルが存在しない木構造はNoneとなる
+#
+#lazyがTrueなら、生成時にはrol_id_listで指定した大項目のみ構築・注釈し
+#それ以外の大項目はannotate_role・read_instance_dataで初めて用いた時点で構築・注釈する
+#
+#use_snapshotがTrueなら、スナップショットがあれば復元し
+#リンクベースファイルから読み込んだ、または新たに注釈を付けた木構造のスナップショットを保存する
+#ただしlazyがTrueの場合、スナップショットの保存時に全ての大項目を構築することになるため
+#生成時には保存せず、必要な大項目を処理した後にsave_snapshotを呼び出す
+class XBRLLinkBaseTreeSet():
+
+	def __init__(self, xbrl_path_data, rol_id_list = None, lazy = False, use_snapshot = False, prefetch = True):
+
+		self.__xbrl_path_data = xbrl_path_data
+
+		#要素毎のスキーマファイルの属性と日本語名称
+		self.__concept_info_dict = {}
+
+		#注釈を付けた大項目
+		self.__annotated_rol_set = set()
+
+
+		#参照するタクソノミのファイルを並列に取得しておく
+		if prefetch == True :
+			XMLDataGetter.prefetch_xbrl(xbrl_path_data)
+
+
+		#load_file_kind -> 木構造
+		self.__tree_dict = {}
+		for load_file_kind, load_file_path in [('presentation', xbrl_path_data.get_pre_file_path()), \
+							('definition', xbrl_path_data.get_def_file_path()), \
+							('calculation', xbrl_path_data.get_cal_file_path())] :
+
+			#存在しないファイルは'no files'となっている
+			if not os.path.exists(load_file_path) :
+
+				self.__tree_dict[load_file_kind] = None
+				continue
+
+			if use_snapshot == True :
+				self.__tree_dict[load_file_kind] = XBRLLinkBaseTree.load(load_file_kind, xbrl_path_data, lazy)
+
+			else :
+				self.__tree_dict[load_file_kind] = XBRLLinkBaseTree(load_file_kind, xbrl_path_data, lazy)
+
+
+		#注釈を付ける大項目
+		#指定が無ければいずれかの木構造に存在する全ての大項目(lazyなら無し)
+		if rol_id_list == None and lazy == True :
+
+			rol_id_list = list()
+
+		elif rol_id_list == None :
+
+			rol_id_list = list()
+			for tree in self.__tree_dict.values() :
+
+				if tree == None :
+					continue
+
+				for rol_id in tree.get_rol_list() :
+
+					if rol_id not in rol_id_list :
+						rol_id_list.append(rol_id)
+
+
+		for rol_id in rol_id_list :
+			self.annotate_role(rol_id)
+
+
+		if use_snapshot == True and lazy == False :
+			self.save_snapshot()
+
+
+	def get_xbrl_path_data(self) :
+		return self.__xbrl_path_data
+
+	def get_tree(self, load_file_kind) :
+		return self.__tree_dict.get(load_file_kind)
+
+	def get_pre_tree(self) :
+		return self.__tree_dict['presentation']
+
+	def get_def_tree(self) :
+		return self.__tree_dict['definition']
+
+	def get_cal_tree(self) :
+		return self.__tree_dict['calculation']
+
+
+	#大項目の3つの木構造に注釈を付け、関連付ける
+	#注釈済みの大項目は処理しない
+	def annotate_role(self, rol_id) :
+
+		if rol_id in self.__annotated_rol_set :
+			return
+
+		pre_tree = self.get_pre_tree()
+		def_tree = self.get_def_tree()
+		cal_tree = self.get_cal_tree()
+
+		if pre_tree != None :
+			pre_tree.annotate_role(rol_id, def_linkbase_tree = def_tree, concept_info_dict = self.__concept_info_dict)
+
+		if def_tree != None :
+			def_tree.annotate_role(rol_id, concept_info_dict = self.__concept_info_dict)
+
+		if cal_tree != None :
+			cal_tree.annotate_role(rol_id, def_linkbase_tree = def_tree, pre_tree = pre_tree, concept_info_dict = self.__concept_info_dict)
+
+		self.__annotated_rol_set.add(rol_id)
+
+
+	#表示リンクベースの木構造にインスタンス文書の値を読み込み
+	#計算リンクベースの木構造に転記する
+	#注釈を付けていない大項目なら先に注釈を付ける
+	def read_instance_data(self, rol_id, xbrl_instance_file_analyzer, selected_axis_member_dict, target_time_str, one_before_str, mode = 'default') :
+
+		pre_tree = self.get_pre_tree()
+		cal_tree = self.get_cal_tree()
+
+		if pre_tree == None :
+			return
+
+		self.annotate_role(rol_id)
+
+		pre_tree.read_instance_data(rol_id, xbrl_instance_file_analyzer, selected_axis_member_dict, target_time_str, one_before_str, mode)
+
+		if cal_tree != None :
+			cal_tree.read_instance_data_from_another_tree(pre_tree, rol_id)
+
+
+	#各木構造のスナップショットを保存する
+	#スナップショットから変更の無い木構造は保存しない
+	def save_snapshot(self) :
+
+		for tree in self.__tree_dict.values() :
+
+			if tree != None and tree.is_snapshot_stale() :
+				tree.save_snapshot()
+
+
+
+#子を持たないノードで共有する空の子ノード列
+EMPTY_CHILDREN = ()
+
+
 #リンクベースファイルを構成するノード
+#
+#1つの提出書類で数十万個生成されるため
+#__slots__で__dict__を持たないようにし、繰り返し現れる文字列はinternして共有する
 class LinkBaseNode(IterableNode) :
 
+	__slots__ = ('__node_kind', \
+			'__label_in_linkbase', \
+			'__order', \
+			'__parent', \
+			'__children', \
+			'__href', \
+			'__id', \
+			'__usage', \
+			'__name', \
+			'__period_type', \
+			'__jp_label')
+
 
 	def __init__(self, label_in_linkbase, node_kind):
 
@@ -1196,11 +1708,11 @@ class LinkBaseNode(IterableNode) :
 		# 'root'          読み込みのために存在
 		# 'document_name' 有報表示構造における大項目
 		# 'content'       大項目の下にある構造要素
-		self.__node_kind = node_kind
+		self.__node_kind = sys.intern(node_kind)
 
 
 		#表示リンクベースファイル中のラベル属性
-		self.__label_in_linkbase = label_in_linkbase
+		self.__label_in_linkbase = LinkBaseNode.intern(label_in_linkbase)
 
 		#親要素からみた子要素の順序
 		self.__order = None
@@ -1209,7 +1721,8 @@ class LinkBaseNode(IterableNode) :
 		self.__parent = None
 
 		#子要素
-		self.__children = list()
+		#子が追加されるまでは共有の空タプルを用いる
+		self.__children = EMPTY_CHILDREN
 
 		#スキーマファイル中要素のURI
 		self.__href = None
@@ -1235,16 +1748,42 @@ class LinkBaseNode(IterableNode) :
 	#href要素を設定する
 	def set_href(self, href) :
 
-		self.__href = href
-		self.__id = href.split('#')[-1]
+		self.__href = LinkBaseNode.intern(href)
+		self.__id = LinkBaseNode.intern(href.split('#')[-1])
 
 
 	#子ノードを追加する(順序付き)
+	#
+	#子ノードは順序の昇順に並べて保持する
+	#同じ順序の子ノードは追加した順に並ぶ(安定ソートと同じ結果になる)
 	def append_child(self, child, order):
 		child.__order = order
+
+		if self.__children is EMPTY_CHILDREN :
+			self.__children = list()
+
+		self.__children.insert(bisect.bisect_right(self.__children, child), child)
+
+
+	#子ノードを順序で並べ替えずに末尾に追加する
+	#追加し終えたらsort_childrenで並べ替えること
+	def append_child_unsorted(self, child, order):
+		child.__order = order
+
+		if self.__children is EMPTY_CHILDREN :
+			self.__children = list()
+
 		self.__children.append(child)
 
 
+	#子ノードを順序の昇順に並べ替える
+	#同じ順序の子ノードは追加した順に並ぶ
+	def sort_children(self):
+
+		if self.__children is not EMPTY_CHILDREN :
+			self.__children.sort()
+
+
 	#スキーマファイルのURIを取得する
 	def get_xsd_uri(self) :
 		return self.__href.split('#')[0]
@@ -1253,7 +1792,7 @@ class LinkBaseNode(IterableNode) :
 		return self.__id
 
 	def set_usage(self, usage) :
-		self.__usage = usage
+		self.__usage = LinkBaseNode.intern(usage)
 
 	def get_usage(self) :
 		return self.__usage
@@ -1262,13 +1801,13 @@ class LinkBaseNode(IterableNode) :
 		return self.__href
 
 	def set_name(self, name) :
-		self.__name = name
+		self.__name = LinkBaseNode.intern(name)
 
 	def get_name(self) :
 		return self.__name
 
 	def set_period_type(self, period_type):
-		self.__period_type = period_type
+		self.__period_type = LinkBaseNode.intern(period_type)
 
 	def get_period_type(self):
 		return self.__period_type
@@ -1281,7 +1820,12 @@ class LinkBaseNode(IterableNode) :
 		self.__order = order
 
 
+	#子を持たないノードでは共有の空タプルではなく、新しい空のリストを返す
 	def get_children(self) :
+
+		if self.__children is EMPTY_CHILDREN :
+			return list()
+
 		return self.__children
 
 	def get_label_in_linkbase(self) :
@@ -1306,6 +1850,15 @@ class LinkBaseNode(IterableNode) :
 	def __lt__(self, other):
 		return self.__order < other.__order
 
+	#文字列ならinternする(Noneなどはそのまま返す)
+	@staticmethod
+	def intern(value) :
+
+		if type(value) is str :
+			return sys.intern(value)
+
+		return value
+
 	def __str__(self) :
 
 		return '(' + str(self.get_usage()) + ')' + str(self.get_id()) + '(' + str(self.get_jp_label()) + ')'
@@ -1314,6 +1867,11 @@ class LinkBaseNode(IterableNode) :
 #定義リンクベースファイルのノード
 class XBRLStructureNode(LinkBaseNode):
 
+	__slots__ = ('__dimension_default_flag', \
+			'__preferred_label', \
+			'__weight', \
+			'__xbrl_data')
+
 
 	def __init__(self, label_in_linkbase, node_kind):
 
@@ -1353,7 +1911,7 @@ class XBRLStructureNode(LinkBaseNode):
 		return self.__preferred_label
 
 	def set_preferred_label(self, preferred_label) :
-		self.__preferred_label = preferred_label
+		self.__preferred_label = LinkBaseNode.intern(preferred_label)
 	
 
 	def set_weight(self, weight) :
@@ -1373,6 +1931,28 @@ class XBRLStructureNode(LinkBaseNode):
 		return self.__xbrl_data
 
 
+	#スナップショットにはインスタンス文書から読み込んだ値を含めない
+	#
+	#__slots__の属性は(None, 属性名 -> 値の辞書)として保存する
+	#属性名は名前修飾後のものとする
+	def __getstate__(self):
+
+		slot_state_dict = {}
+
+		for node_class in type(self).__mro__ :
+
+			for slot_name in node_class.__dict__.get('__slots__', ()) :
+
+				if slot_name.startswith('__') :
+					slot_name = '_' + node_class.__name__.lstrip('_') + slot_name
+
+				slot_state_dict[slot_name] = getattr(self, slot_name)
+
+		slot_state_dict['_XBRLStructureNode__xbrl_data'] = None
+
+		return (None, slot_state_dict)
+
+
 	def __str__(self) :
 
 		description_str = super().__str__()
@@ -1411,6 +1991,9 @@ class XBRLStructureNode(LinkBaseNode):
 
 class NameLinkBaseAnalysis():
 
+	#名称リンクベースファイル -> (要素ID -> (ラベルのロール -> 日本語名称))
+	label_dict_cache = {}
+
 	@staticmethod
 	def get_JPNameLinkBaseList(xbrl_path_data):
 
@@ -1449,86 +2032,62 @@ class NameLinkBaseAnalysis():
 
 		for labfile in labfile_list :
 
-			jp_str_label_records = list()
-
-			#まずローカルに名称リンクベースを読み込んだデータがないか確認する
-			#存在するなら過去の読み込み結果を使う
-
-			hash_str = hashlib.sha256(labfile.encode('utf-8')).hexdigest()
-			bin_file_name = '.' + os.sep + 'labfile' + os.sep + 'labfile_structure_' + labfile.translate(str.maketrans('/\\.:', '____')) +'_' + hash_str
-
-			if os.path.isfile(bin_file_name) :
-
-				logger.debug('load labfile from cache : ' +  bin_file_name)
-
-				with open(bin_file_name, 'rb') as f:
-
-					jp_str_label_records = pickle.load(f)
-					labfile_structure_dicts[labfile] = jp_str_label_records
-
-				continue
-
-			logger.debug('load labfile from xml : ' + labfile)
-
-			#ファイルが存在しないなら一から読み込み処理を実行する
-			jp_str_label_records = list()
+			labfile_structure_dicts[labfile] = NameLinkBaseAnalysis.get_JPNameLabelRecordList(labfile)
 
-			soup = XMLDataGetter.get(labfile)
-
-			loc_elms= soup.select('loc')
-			label_arc_elms = soup.select('labelArc')
-			label_elms =  soup.select('label')
-
-
-			for loc_elm in loc_elms :
-
-
-				#loc要素から要素IDに対応するラベルを辿るためのリンク名称を取得する
-				elm_href =  loc_elm.get('xlink:href')
-				elm_id = elm_href.split('#')[-1]
-
-				link_name = loc_elm.get('xlink:label')
-
-
-				#リンク名からIDにリンクされているラベルを取得する
-				for label_arc_elm in label_arc_elms :
-
-					if not label_arc_elm.get('xlink:from') == link_name :
-
-						continue
 
+		return labfile_structure_dicts
 
-					label_id = label_arc_elm.get('xlink:to')
 
-					for label_elm in label_elms :
+	#名称リンクベースファイル毎に
+	#要素ID -> (ラベルのロール -> 日本語名称)
+	#となる辞書(XBRLLabelStore)を取得する
+	#
+	#同じ要素ID・ロールのラベルが複数ある場合は先に出現したものを用いる
+	#ラベルはラベル格納ファイルから必要な要素のみ検索するため、全てのラベルをメモリ上に展開しない
+	#一度開いたラベル格納ファイルは保持し、全ての木構造で共有する
+	@classmethod
+	def get_JPNameLabelDict(cls, xbrl_path_data):
 
+		labfile_label_dicts = {}
 
-						if not label_elm.get('xlink:label') == label_id :
+		for labfile in NameLinkBaseAnalysis.get_JPNameLinkBaseList(xbrl_path_data) :
 
-							continue
+			labfile_label_dicts[labfile] = cls.get_label_store(labfile)
 
-						jp_label = str(label_elm.string)
-						label_role = label_elm.get('xlink:role')
+		return labfile_label_dicts
 
 
-						jp_str_label_records.append(JPStrLabelRecord(elm_id, label_role, jp_label))
+	#名称リンクベースファイルのラベル格納ファイルを取得する
+	#開いたラベル格納ファイルはclear_cacheで閉じるまで保持する
+	@classmethod
+	def get_label_store(cls, labfile):
 
+		label_dict = cls.label_dict_cache.get(labfile)
+		if label_dict == None :
 
+			label_dict = XBRLLabelStore.open_store(labfile)
+			cls.label_dict_cache[labfile] = label_dict
 
+		return label_dict
 
-			labfile_structure_dicts[labfile] = jp_str_label_records
 
+	@classmethod
+	def clear_cache(cls):
 
-			if not os.path.exists( '.' + os.sep + 'labfile' ) :
-				os.makedirs( '.' + os.sep + 'labfile' )
+		for label_dict in cls.label_dict_cache.values() :
+			label_dict.close()
 
-			with open(bin_file_name, 'wb') as f:
+		cls.label_dict_cache = {}
+		XBRLLabelStore.clear_cache()
 
-				pickle.dump(jp_str_label_records, f)
 
+	#名称リンクベースファイル(日本語)のレコードリストを取得する
+	@staticmethod
+	def get_JPNameLabelRecordList(labfile):
 
+		label_dict = NameLinkBaseAnalysis.get_label_store(labfile)
 
-		return labfile_structure_dicts
+		return [JPStrLabelRecord(elm_id, label_role, jp_str) for elm_id, label_role, jp_str in label_dict.get_label_tuple_list()]
 
 
 
@@ -1607,7 +2166,7 @@ class XBRLInstanceFileAnalysis() :
 
 		soup = XMLDataGetter.get(inline_xbrl_path)
 
-		nonfraction_elms = soup.select('ix|nonFraction')
+		nonfraction_elms = soup.select('nonFraction')
 		for nonfraction_elm in nonfraction_elms :
 
 			self.__inline_xbrl_data_list.append( InlineXBRLValueData( 'nonFraction', \
@@ -1623,7 +2182,7 @@ class XBRLInstanceFileAnalysis() :
 						nonfraction_elm.get_text()) )
   
 	
-		nonnumeric_elms = soup.select('ix|nonNumeric')
+		nonnumeric_elms = soup.select('nonNumeric')
 		for nonnumeric_elm in nonnumeric_elms :
 
 			attr_escape_str = nonnumeric_elm.get('escape')
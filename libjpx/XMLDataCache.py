@@ -0,0 +1,254 @@
+from collections import OrderedDict
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+
+#解析済みXMLデータのキャッシュ
+#
+#エントリ数または推定バイト数の上限を超えた場合、最も長く使われていない
+#エントリから破棄する(LRU)
+#
+#固定(pin)されたエントリは、固定されていないエントリが無くなるまで破棄しない
+#タクソノミのスキーマファイルや名称リンクベースファイルなど
+#複数の提出書類で共有するデータを固定しておくことを想定している
+#
+#複数のスレッドから同時に操作できる
+class XMLDataCache():
+
+	def __init__(self, max_entries = None, max_bytes = None):
+
+		#key -> (data, nbytes)
+		#いずれも先頭が最も長く使われていないエントリ
+		self.__unpinned_entry_dict = OrderedDict()
+		self.__pinned_entry_dict = OrderedDict()
+
+		#上限(Noneなら無制限)
+		self.__max_entries = max_entries
+		self.__max_bytes = max_bytes
+
+		self.__total_bytes = 0
+
+		#固定対象のキーおよびキーの前方一致文字列
+		self.__pinned_key_set = set()
+		self.__pinned_prefix_list = list()
+
+		self.__lock = threading.RLock()
+
+
+	def __contains__(self, key):
+
+		with self.__lock :
+
+			return key in self.__unpinned_entry_dict or key in self.__pinned_entry_dict
+
+
+	def __len__(self):
+
+		with self.__lock :
+
+			return len(self.__unpinned_entry_dict) + len(self.__pinned_entry_dict)
+
+
+	def __getitem__(self, key):
+
+		with self.__lock :
+
+			entry_dict = self.__get_entry_dict(key)
+			if entry_dict == None :
+				raise KeyError(key)
+
+			entry_dict.move_to_end(key)
+			return entry_dict[key][0]
+
+
+	def __setitem__(self, key, data):
+
+		self.put(key, data)
+
+
+	def get(self, key, default = None):
+
+		with self.__lock :
+
+			if key not in self :
+				return default
+
+			return self[key]
+
+
+	#データを登録する
+	#
+	#nbytesはデータの推定バイト数
+	#XMLDataGetterは解析前のXMLファイルのサイズを用いる
+	def put(self, key, data, nbytes = 0):
+
+		with self.__lock :
+
+			self.pop(key)
+
+			if self.is_pinned(key) :
+				self.__pinned_entry_dict[key] = (data, nbytes)
+
+			else :
+				self.__unpinned_entry_dict[key] = (data, nbytes)
+
+			self.__total_bytes = self.__total_bytes + nbytes
+
+			self.__evict()
+
+
+	def pop(self, key, default = None):
+
+		with self.__lock :
+
+			entry_dict = self.__get_entry_dict(key)
+			if entry_dict == None :
+				return default
+
+			data, nbytes = entry_dict.pop(key)
+			self.__total_bytes = self.__total_bytes - nbytes
+
+			return data
+
+
+	#キャッシュを破棄する
+	#
+	#keep_pinnedがTrueなら固定されたエントリは残す
+	def clear(self, keep_pinned = False):
+
+		with self.__lock :
+
+			self.__unpinned_entry_dict.clear()
+
+			if not keep_pinned :
+				self.__pinned_entry_dict.clear()
+
+			self.__total_bytes = sum(nbytes for data, nbytes in self.__pinned_entry_dict.values())
+
+
+	def set_limit(self, max_entries = None, max_bytes = None):
+
+		with self.__lock :
+
+			self.__max_entries = max_entries
+			self.__max_bytes = max_bytes
+
+			self.__evict()
+
+
+	def get_max_entries(self):
+		return self.__max_entries
+
+	def get_max_bytes(self):
+		return self.__max_bytes
+
+	def get_total_bytes(self):
+		with self.__lock :
+
+			return self.__total_bytes
+
+
+	#キーを固定する
+	def pin(self, key):
+
+		with self.__lock :
+
+			self.__pinned_key_set.add(key)
+			self.__move_entry(key)
+
+
+	#キーの固定を解除する
+	def unpin(self, key):
+
+		with self.__lock :
+
+			self.__pinned_key_set.discard(key)
+			self.__move_entry(key)
+
+
+	#前方一致するキーを全て固定する
+	#タクソノミのURLなどを指定する
+	def pin_prefix(self, prefix):
+
+		with self.__lock :
+
+			self.__pinned_prefix_list.append(prefix)
+
+			for key in list(self.__unpinned_entry_dict.keys()) :
+				self.__move_entry(key)
+
+
+	def is_pinned(self, key):
+
+		with self.__lock :
+
+			if key in self.__pinned_key_set :
+				return True
+
+			for prefix in self.__pinned_prefix_list :
+
+				if key.startswith(prefix) :
+					return True
+
+			return False
+
+
+	def __get_entry_dict(self, key):
+
+		if key in self.__unpinned_entry_dict :
+			return self.__unpinned_entry_dict
+
+		if key in self.__pinned_entry_dict :
+			return self.__pinned_entry_dict
+
+		return None
+
+
+	#固定状態に応じてエントリの格納先を移す
+	def __move_entry(self, key):
+
+		entry_dict = self.__get_entry_dict(key)
+		if entry_dict == None :
+			return
+
+		entry = entry_dict.pop(key)
+
+		if self.is_pinned(key) :
+			self.__pinned_entry_dict[key] = entry
+
+		else :
+			self.__unpinned_entry_dict[key] = entry
+
+
+	def __is_over_limit(self):
+
+		if self.__max_entries != None and len(self) > self.__max_entries :
+			return True
+
+		if self.__max_bytes != None and self.__total_bytes > self.__max_bytes :
+			return True
+
+		return False
+
+
+	#上限を超えている間、最も長く使われていないエントリから破棄する
+	#固定されていないエントリを先に破棄する
+	def __evict(self):
+
+		while self.__is_over_limit() :
+
+			if len(self.__unpinned_entry_dict) != 0 :
+				key, entry = self.__unpinned_entry_dict.popitem(last = False)
+
+			elif len(self.__pinned_entry_dict) != 0 :
+				key, entry = self.__pinned_entry_dict.popitem(last = False)
+
+			else :
+				break
+
+			self.__total_bytes = self.__total_bytes - entry[1]
+
+			logger.debug('evict xml from cache:' + key)
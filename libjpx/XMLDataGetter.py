@@ -1,9 +1,19 @@
-import requests
-from bs4 import BeautifulSoup
-import time
 import logging
-import hashlib
 import os
+import hashlib
+import mmap
+import asyncio
+import concurrent.futures
+import threading
+import time
+import traceback
+from .XMLParserBackend import LxmlParserBackend
+from .XMLDataCache import XMLDataCache
+from .HostRateLimiter import HostRateLimiter
+from .HTTPSessionPool import HTTPSessionPool
+from .WebCache import WebCache
+from .XMLDataStats import XMLDataStats
+from .JPXError import JPXAnalysisError
 
 logger = logging.getLogger(__name__)
 
@@ -12,89 +22,704 @@ logger = logging.getLogger(__name__)
 #サーバ上のXMLファイルをキャッシュする
 class XMLDataGetter() :
 
-	data_cache = {}
+	#解析済みデータのキャッシュ
+	#上限はset_cache_limitで設定する(デフォルトは無制限)
+	data_cache = XMLDataCache()
 
-	@classmethod
-	def get(cls, data_path):
+	#XMLファイルの解析に用いるパーサー
+	parser_backend = LxmlParserBackend()
 
+	#接続先ホスト毎のリクエスト頻度の制限
+	#デフォルトは1ホストあたり1秒に1回
+	rate_limiter = HostRateLimiter(1.0, 1)
 
-		soup = None
+	#サーバ上のファイルのローカルキャッシュ
+	#圧縮して保存し、読み込み時に展開する
+	web_cache = WebCache('.' + os.sep + 'webcache')
 
-		if data_path in cls.data_cache :
+	#webcacheの有効期間(秒)
+	#期間を過ぎたファイルは条件付きリクエストで再検証する
+	#Noneなら再検証しない
+	webcache_max_age = None
 
-			logger.debug('get xml from cache:' + data_path)
-			soup = cls.data_cache[data_path]
+	#実行中の取得処理
+	#(処理の種類, データのパス) -> (concurrent.futures.Future, 処理を実行しているイベントループ)
+	#
+	#同じデータの取得処理は同時に1つだけ実行し
+	#他の呼び出し元はその結果を待つ
+	#スレッドで実行している処理のイベントループはNoneとする
+	inflight_dict = {}
+	inflight_lock = threading.Lock()
+
+	#処理の種類 -> 実行中の処理の結果を待った回数の統計名
+	INFLIGHT_WAIT_COUNT_NAME_DICT = {'xml' : 'memory_inflight_wait', 'web' : 'webcache_inflight_wait'}
 
-		elif cls.__get_cache_file_path(data_path) in cls.data_cache :
+	#読み込み状況の統計
+	stats = XMLDataStats()
+
+	@classmethod
+	def get(cls, data_path):
+
+		soup = cls.data_cache.get(data_path)
+		if soup != None :
 
 			logger.debug('get xml from cache:' + data_path)
-			soup = cls.data_cache[cls.__get_cache_file_path(data_path)]
+			cls.stats.count('memory_hit')
+			return soup
+
+		return cls.__run_single_flight(('xml', data_path), cls.__load, data_path)
+
+	@classmethod
+	def __load(cls, data_path):
+
+		#待っている間に他のスレッドが読み込みを終えている場合がある
+		soup = cls.data_cache.get(data_path)
 
-		elif data_path.startswith('http') and os.path.exists(cls.__get_cache_file_path(data_path)) :
+		if soup != None :
 
-			logger.debug('get xml from webcache:' + cls.__get_cache_file_path(data_path))
-			soup = cls.__get_from_local_path(cls.__get_cache_file_path(data_path))
+			logger.debug('get xml from cache:' + data_path)
+			cls.stats.count('memory_hit')
 
 		elif data_path.startswith('http') :
 
-			logger.debug('get xml from url:' + data_path)
+			cls.stats.count('memory_miss')
 			soup = cls.__get_from_html_path(data_path)
 
 		else :
 
+			cls.stats.count('memory_miss')
+
 			logger.debug('get xml from local:' + data_path)
 			soup = cls.__get_from_local_path(data_path)
 
 		return soup
 
+	#getの非同期版
+	#
+	#通信はイベントループ上で行い、ファイルの読み込みと解析はスレッドプールで行う
+	#キャッシュはgetと共有する
+	#通信に用いるセッションは、同じイベントループで並行して実行中の呼び出しが無くなった時点で閉じる
+	@classmethod
+	async def aget(cls, data_path):
+
+		soup = cls.data_cache.get(data_path)
+		if soup != None :
+
+			logger.debug('get xml from cache:' + data_path)
+			cls.stats.count('memory_hit')
+			return soup
+
+		async with HTTPSessionPool.async_session_scope() :
+			return await cls.__arun_single_flight(('xml', data_path), cls.__aload, data_path)
+
+	@classmethod
+	async def __aload(cls, data_path):
+
+		soup = cls.data_cache.get(data_path)
+		if soup != None :
+
+			logger.debug('get xml from cache:' + data_path)
+			cls.stats.count('memory_hit')
+			return soup
+
+
+		cls.stats.count('memory_miss')
+
+		loop = asyncio.get_running_loop()
+
+		if data_path.startswith('http') :
+
+			content_data = await cls.__aread_from_web(data_path)
+			soup = await loop.run_in_executor(None, cls.__parse_bytes, data_path, content_data)
+			nbytes = len(content_data)
+
+		else :
+
+			logger.debug('get xml from local:' + data_path)
+			soup, nbytes = await loop.run_in_executor(None, cls.__parse_local_file, data_path)
+
+
+		cls.data_cache.put(data_path, soup, nbytes)
+
+		return soup
+
+	#キャッシュを破棄する
+	#
+	#keep_pinnedがTrueなら固定されたデータは残す
+	@classmethod
+	def clear_cache(cls, keep_pinned = False):
+		cls.data_cache.clear(keep_pinned)
+
+	#キャッシュの上限を設定する
+	#
+	#max_entriesはエントリ数、max_bytesは解析前のXMLファイルの合計バイト数の上限
+	#Noneなら無制限
+	@classmethod
+	def set_cache_limit(cls, max_entries = None, max_bytes = None):
+		cls.data_cache.set_limit(max_entries, max_bytes)
+
+	#データをキャッシュから破棄されにくくする
+	#
+	#固定されたデータは、固定されていないデータが全て破棄されるまで破棄されない
+	@classmethod
+	def pin(cls, data_path):
+		cls.data_cache.pin(data_path)
+
 	@classmethod
-	def clear_cache(cls):
-		cls.data_cache = {}
+	def unpin(cls, data_path):
+		cls.data_cache.unpin(data_path)
+
+	#前方一致するデータを全て固定する
+	#
+	#例えば'http://disclosure.edinet-fsa.go.jp/taxonomy/'を指定すると
+	#タクソノミのスキーマファイルや名称リンクベースファイルを固定できる
+	@classmethod
+	def pin_prefix(cls, prefix):
+		cls.data_cache.pin_prefix(prefix)
+
+	#読み込み状況の統計を辞書として取得する
+	#
+	#count          取得元毎のヒット・ミス回数
+	#               他のスレッドなどが取得中のデータを待った回数は *_inflight_wait として数える
+	#               (memory_hit + memory_miss + memory_inflight_wait がgetの呼び出し回数となる)
+	#bytes_read     取得元毎の読み込みバイト数
+	#parse_time     文書毎の解析時間(秒)とその合計
+	#network_latency ネットワークの応答時間(秒)
+	#cache          解析済みデータのキャッシュの現在のエントリ数・推定バイト数
+	@classmethod
+	def get_stats(cls):
+
+		stats_dict = cls.stats.to_dict()
+		stats_dict['cache'] = {'entries' : len(cls.data_cache), \
+					'bytes' : cls.data_cache.get_total_bytes(), \
+					'max_entries' : cls.data_cache.get_max_entries(), \
+					'max_bytes' : cls.data_cache.get_max_bytes()}
+
+		return stats_dict
+
+	#統計をリセットする
+	@classmethod
+	def reset_stats(cls):
+		cls.stats.reset()
+
+	#パーサーを差し替える
+	#
+	#解析結果の型が変わるため、キャッシュ済みのデータは破棄する
+	@classmethod
+	def set_parser_backend(cls, parser_backend):
+		cls.parser_backend = parser_backend
+		cls.clear_cache()
+
+	@classmethod
+	def get_parser_backend(cls):
+		return cls.parser_backend
+
+	#webcacheの有効期間(秒)を設定する
+	#
+	#期間を過ぎたファイルはETag, Last-Modifiedを用いた条件付きリクエストで再検証し
+	#変更されていなければ(304)ダウンロードせずにそのまま使う
+	@classmethod
+	def set_webcache_max_age(cls, max_age):
+		cls.webcache_max_age = max_age
+
+
+	#接続先ホスト毎のリクエスト頻度の制限を変更する
+	#
+	#rateは1秒あたりのリクエスト数、capacityは連続して送信できるリクエスト数
+	@classmethod
+	def set_rate_limit(cls, rate, capacity = 1):
+		cls.rate_limiter.set_rate(rate, capacity)
+
+
+	#URLのデータを並列にダウンロードしwebcacheに保存しておく
+	#
+	#ダウンロードのみ行い、解析はgetの呼び出し時に行う
+	#リクエスト頻度は接続先ホスト毎にrate_limiterで制限される
+	#ダウンロードしたURLのリストを返す
+	@classmethod
+	def prefetch(cls, url_list, max_workers = 8):
+
+		target_url_list = cls.__get_prefetch_target_url_list(url_list)
+
+
+		fetched_url_list = list()
+		if len(target_url_list) == 0 :
+			return fetched_url_list
+
+
+		logger.debug(f'prefetch {len(target_url_list)} urls')
+
+		with concurrent.futures.ThreadPoolExecutor(max_workers = max_workers) as executor :
+
+			future_to_url_dict = {executor.submit(cls.__read_from_web, url) : url for url in target_url_list}
+
+			for future in concurrent.futures.as_completed(future_to_url_dict) :
+
+				url = future_to_url_dict[future]
+
+				#取得に失敗したURLはgetの呼び出し時に改めて取得する
+				try :
+					future.result()
+
+				except Exception as e :
+
+					logger.error('prefetch failed:' + url)
+					logger.error(list(traceback.TracebackException.from_exception(e).format()))
+					continue
+
+				fetched_url_list.append(url)
+
+		return fetched_url_list
+
+
+	#prefetchの非同期版
+	#
+	#全てのURLのダウンロードを1つのイベントループ上で並行して行う
+	#通信に用いるセッションはダウンロードを終えた時点で閉じる
+	@classmethod
+	async def aprefetch(cls, url_list):
+
+		target_url_list = cls.__get_prefetch_target_url_list(url_list)
+
+
+		async with HTTPSessionPool.async_session_scope() :
+			result_list = await asyncio.gather(*[cls.__aread_from_web(url) for url in target_url_list], return_exceptions = True)
+
+
+		fetched_url_list = list()
+		for url, result in zip(target_url_list, result_list) :
+
+			#取得に失敗したURLはgetの呼び出し時に改めて取得する
+			if isinstance(result, Exception) :
+
+				logger.error('prefetch failed:' + url)
+				logger.error(list(traceback.TracebackException.from_exception(result).format()))
+				continue
+
+			fetched_url_list.append(url)
+
+		return fetched_url_list
+
+
+	#重複を除き、webcacheに有効なデータが存在しないURLのみ対象とする
+	@classmethod
+	def __get_prefetch_target_url_list(cls, url_list):
+
+		target_url_list = list()
+		for url in dict.fromkeys(url_list) :
+
+			if not url.startswith('http') :
+				continue
+
+			if url in cls.data_cache or cls.__is_fresh_in_web_cache(url) :
+				continue
+
+			target_url_list.append(url)
+
+		return target_url_list
+
+
+	#提出書類が参照するスキーマファイルおよびリンクベースファイルを並列にダウンロードする
+	@classmethod
+	def prefetch_xbrl(cls, xbrl_path_data, max_workers = 8):
+
+		return cls.prefetch(cls.get_reference_url_list(xbrl_path_data), max_workers)
+
+
+	#提出書類が参照するスキーマファイルおよびリンクベースファイルのURLを収集する
+	#
+	#提出者のスキーマファイルのlinkbaseRef、import、roleRef要素と
+	#提出者のリンクベースファイルのloc、roleRef要素が参照するURLが対象
+	@classmethod
+	def get_reference_url_list(cls, xbrl_path_data):
+
+		url_list = list()
+
+		local_file_path_list = [xbrl_path_data.get_xsd_file_path(), \
+					xbrl_path_data.get_pre_file_path(), \
+					xbrl_path_data.get_def_file_path(), \
+					xbrl_path_data.get_cal_file_path(), \
+					xbrl_path_data.get_lab_file_path()]
+
+		for local_file_path in local_file_path_list :
+
+			#存在しないファイルは'no files'となっている
+			if not os.path.exists(local_file_path) :
+				continue
+
+			soup = cls.get(local_file_path)
+
+			for local_name, attr_name in [('linkbaseRef', 'xlink:href'), ('roleRef', 'xlink:href'), ('loc', 'xlink:href'), ('import', 'schemaLocation')] :
+
+				for elm in soup.select(local_name) :
+
+					href = elm.get(attr_name)
+					if href != None and href.startswith('http') :
+						url_list.append(href.split('#')[0])
+
+		return list(dict.fromkeys(url_list))
+
+
+	#XMLファイルを木構造にせず、指定したローカル名の要素を逐次取得する
+	#
+	#返された要素は次の要素を取得した時点で破棄される可能性がある
+	@classmethod
+	def iter_elements(cls, data_path, local_name_list):
+
+		return cls.parser_backend.iter_elements(cls.get_bytes(data_path), local_name_list)
+
+	#XMLファイルを解析せずにバイト列のまま取得する
+	@classmethod
+	def get_bytes(cls, data_path):
+
+		if data_path.startswith('http') :
+
+			return cls.__read_from_web(data_path)
+
+		else :
+
+			logger.debug('get bytes from local:' + data_path)
+
+			bdata = cls.__read_local_file(data_path)
+
+			cls.stats.count('local_read')
+			cls.stats.add_bytes_read('local', len(bdata))
+
+			return bdata
+
+	#データの内容のハッシュ値(SHA-256)を取得する
+	#
+	#URLの場合、webcacheに有効なデータがあれば保存時に記録したハッシュ値を用い、本体は読み込まない
+	#有効なデータが無ければ取得または再検証してwebcacheを更新してから記録を参照する
+	@classmethod
+	def get_content_hash(cls, data_path):
+
+		if data_path.startswith('http') :
+
+			if not cls.__is_fresh_in_web_cache(data_path) :
+				cls.__read_from_web(data_path)
+
+			return cls.web_cache.read_meta(data_path)['content_hash']
+
+		return hashlib.sha256(cls.get_bytes(data_path)).hexdigest()
 
 	@classmethod
 	def __get_from_html_path(cls, url):
 
-		r = requests.get(url)
-		soup = BeautifulSoup(r.content, 'xml')
-		content_data = r.content
-		r.close()
+		content_data = cls.__read_from_web(url)
+		soup = cls.__parse_bytes(url, content_data)
+
+		cls.data_cache.put(url, soup, len(content_data))
+		return soup
+
+	#バイト列を解析する(解析時間を記録する)
+	@classmethod
+	def __parse_bytes(cls, data_path, content_data):
 
-		time.sleep(1.0)
+		start_time = time.perf_counter()
+		soup = cls.parser_backend.parse(content_data)
+		cls.stats.add_parse_time(data_path, time.perf_counter() - start_time)
 
-		cls.data_cache[url] = soup
-		cls.__save_cache_file(content_data, url)
 		return soup
 
+	#ローカルファイルを読み込む
+	#
+	#ファイル全体をbytesとして読み込まず、メモリマップしたまま解析する
+	#巨大なインラインXBRLファイルを読み込む際に、一時的にファイルサイズ分の
+	#メモリを余計に使わないようにするため
 	@classmethod
 	def __get_from_local_path(cls, local_path):
 
+		soup, nbytes = cls.__parse_local_file(local_path)
 
-		fin = open(local_path, 'rb')
-		bdata = fin.read()
-		soup = BeautifulSoup(bdata, 'xml')
-		fin.close()
+		cls.data_cache.put(local_path, soup, nbytes)
 
+		return soup
 
-		cls.data_cache[local_path] = soup
+	#ローカルファイルを解析し (解析結果, ファイルサイズ) を返す
+	@classmethod
+	def __parse_local_file(cls, local_path):
 
-		return soup
+		start_time = time.perf_counter()
+
+		with open(local_path, 'rb') as fin :
+
+			#空のファイルはメモリマップできない
+			if os.fstat(fin.fileno()).st_size == 0 :
+
+				nbytes = 0
+				soup = cls.parser_backend.parse(b'')
+
+			else :
+
+				with mmap.mmap(fin.fileno(), 0, access = mmap.ACCESS_READ) as buffer :
+
+					nbytes = len(buffer)
+					soup = cls.parser_backend.parse_buffer(buffer)
+
+		cls.stats.count('local_read')
+		cls.stats.add_bytes_read('local', nbytes)
+		cls.stats.add_parse_time(local_path, time.perf_counter() - start_time)
+
+		return soup, nbytes
+
+	@classmethod
+	def __is_fresh_in_web_cache(cls, url):
+
+		return cls.web_cache.exists(url) and not cls.web_cache.is_stale(url, cls.webcache_max_age)
+
+	#URLのデータを取得する
+	#
+	#webcacheに有効なデータがあればそれを使う
+	#有効期間を過ぎていれば条件付きリクエストで再検証し
+	#webcacheに無ければダウンロードしてwebcacheに保存する
+	@classmethod
+	def __read_from_web(cls, url):
+
+		return cls.__run_single_flight(('web', url), cls.__fetch_from_web, url)
+
+	@classmethod
+	def __fetch_from_web(cls, url):
+
+		if cls.__is_fresh_in_web_cache(url) :
+
+			logger.debug('get xml from webcache:' + cls.web_cache.get_record_file_path(url))
+			cls.stats.count('webcache_hit')
+			return cls.__read_web_cache(url)
+
+
+		cls.stats.count('webcache_miss')
+
+		headers = cls.__get_request_headers(url)
+
+		cls.rate_limiter.acquire(url)
+
+		start_time = time.perf_counter()
+
+		try :
+
+			r = HTTPSessionPool.get(url, headers)
+			status_code = r.status_code
+			response_headers = r.headers
+			content_data = r.content
+			r.close()
+
+		except HTTPSessionPool.REQUEST_EXCEPTIONS as e :
+
+			#webcacheにデータがあれば古いデータを使う
+			if headers == None :
+				raise
+
+			return cls.__read_stale_web_cache(url, type(e).__name__)
+
+		cls.__record_network_request(url, time.perf_counter() - start_time, len(content_data))
+
+		return cls.__handle_response(url, headers, status_code, response_headers, content_data)
+
+	#__read_from_webの非同期版
+	@classmethod
+	async def __aread_from_web(cls, url):
+
+		return await cls.__arun_single_flight(('web', url), cls.__afetch_from_web, url)
+
+	@classmethod
+	async def __afetch_from_web(cls, url):
+
+		loop = asyncio.get_running_loop()
+
+		if cls.__is_fresh_in_web_cache(url) :
+
+			logger.debug('get xml from webcache:' + cls.web_cache.get_record_file_path(url))
+			cls.stats.count('webcache_hit')
+			return await loop.run_in_executor(None, cls.__read_web_cache, url)
+
+
+		cls.stats.count('webcache_miss')
+
+		headers = cls.__get_request_headers(url)
+
+		await cls.rate_limiter.acquire_async(url)
+
+		start_time = time.perf_counter()
 
+		try :
+
+			status_code, response_headers, content_data = await HTTPSessionPool.aget(url, headers)
+
+		except HTTPSessionPool.REQUEST_EXCEPTIONS as e :
+
+			#webcacheにデータがあれば古いデータを使う
+			if headers == None :
+				raise
+
+			return await loop.run_in_executor(None, cls.__read_stale_web_cache, url, type(e).__name__)
+
+		cls.__record_network_request(url, time.perf_counter() - start_time, len(content_data))
+
+		return await loop.run_in_executor(None, cls.__handle_response, url, headers, status_code, response_headers, content_data)
+
+	#リクエストヘッダーを生成する
+	#webcacheにデータがあれば条件付きリクエストとする
+	@classmethod
+	def __get_request_headers(cls, url):
+
+		if cls.web_cache.exists(url) :
+
+			logger.debug('revalidate webcache:' + url)
+			return cls.web_cache.get_conditional_headers(url)
+
+		logger.debug('get xml from url:' + url)
+		return None
+
+	#レスポンスに応じてwebcacheを更新し、データを返す
+	@classmethod
+	def __handle_response(cls, url, headers, status_code, response_headers, content_data):
+
+		#変更されていないならwebcacheのデータを使う
+		if status_code == 304 and headers != None :
+
+			cls.stats.count('webcache_not_modified')
+			cls.web_cache.touch(url)
+			return cls.__read_web_cache(url)
+
+
+		if status_code != 200 :
+
+			#再検証に失敗した場合は古いデータを使う
+			if headers != None :
+				return cls.__read_stale_web_cache(url, f'status {status_code}')
+
+			raise JPXAnalysisError(f'request failed status {status_code}:' + url)
+
+
+		cls.web_cache.write(url, content_data, response_headers.get('ETag'), response_headers.get('Last-Modified'))
+		return content_data
+
+	@classmethod
+	def __read_web_cache(cls, url):
+
+		content_data = cls.web_cache.read(url)
+		cls.stats.add_bytes_read('webcache', len(content_data))
+
+		return content_data
+
+	#再検証に失敗した場合にwebcacheの古いデータを読み込む
+	#
+	#reasonには失敗の理由(ステータスコードや例外の名称)を指定する
 	@classmethod
-	def __get_cache_file_path(cls, url) :
+	def __read_stale_web_cache(cls, url, reason):
 
-		hash_str = hashlib.sha256(url.encode('utf-8')).hexdigest()
-		cash_file_path = '.' + os.sep + 'webcache' + os.sep + 'xml_text_' + url.translate(str.maketrans('/\\.:', '____')) +'_' + hash_str
-		return cash_file_path
+		logger.warning(f'revalidate failed {reason}, use stale webcache:' + url)
+		return cls.__read_web_cache(url)
+
+	@classmethod
+	def __record_network_request(cls, url, seconds, nbytes):
 
+		cls.stats.count('network_request')
+		cls.stats.add_network_latency(url, seconds)
+		cls.stats.add_bytes_read('network', nbytes)
 
+	#同じキーの処理が実行中でなければfuncを実行し、実行中ならその結果を待つ
 	@classmethod
-	def __save_cache_file(cls, content_data, url):
+	def __run_single_flight(cls, key, func, *args):
+
+		future, is_owner, owner_loop = cls.__begin_flight(key, None)
+		if not is_owner :
+
+			#実行中の処理がこのスレッドのイベントループ上にある場合は
+			#結果を待つとイベントループが止まり処理が終わらないため、待たずに別途取得する
+			if owner_loop != None and owner_loop is cls.__get_running_loop() :
+
+				logger.debug(f'in-flight {key[0]} is running on this event loop:' + key[1])
+				return func(*args)
+
+			logger.debug(f'wait for in-flight {key[0]}:' + key[1])
+			cls.stats.count(cls.INFLIGHT_WAIT_COUNT_NAME_DICT[key[0]])
+			return future.result()
 
+		try :
+			result = func(*args)
 
-		if not os.path.exists('.' + os.sep + 'webcache') :
-			os.mkdir('.' + os.sep + 'webcache')
+		except BaseException as e :
 
-		f = open(XMLDataGetter.__get_cache_file_path(url), 'wb')
-		f.write(content_data)
-		f.close()
+			cls.__end_flight(key, future, None, e)
+			raise
+
+		cls.__end_flight(key, future, result, None)
+		return result
+
+	#__run_single_flightの非同期版
+	#
+	#実行中の処理はスレッドで実行されている場合もあるため
+	#concurrent.futures.Futureを介して結果を待つ
+	@classmethod
+	async def __arun_single_flight(cls, key, coroutine_func, *args):
+
+		future, is_owner, owner_loop = cls.__begin_flight(key, asyncio.get_running_loop())
+		if not is_owner :
+
+			logger.debug(f'wait for in-flight {key[0]}:' + key[1])
+			cls.stats.count(cls.INFLIGHT_WAIT_COUNT_NAME_DICT[key[0]])
+			return await asyncio.wrap_future(future)
+
+		try :
+			result = await coroutine_func(*args)
+
+		except BaseException as e :
+
+			cls.__end_flight(key, future, None, e)
+			raise
+
+		cls.__end_flight(key, future, result, None)
+		return result
+
+	#処理の実行を登録する
+	#既に実行中なら (そのFuture, False, 実行中のイベントループ) を
+	#そうでなければ (新しいFuture, True, loop) を返す
+	@classmethod
+	def __begin_flight(cls, key, loop):
+
+		with cls.inflight_lock :
+
+			if key in cls.inflight_dict :
+				future, owner_loop = cls.inflight_dict[key]
+				return future, False, owner_loop
+
+			future = concurrent.futures.Future()
+			cls.inflight_dict[key] = (future, loop)
+
+			return future, True, loop
+
+	#このスレッドで実行中のイベントループを取得する
+	#実行中でなければNoneを返す
+	@staticmethod
+	def __get_running_loop():
+
+		try :
+			return asyncio.get_running_loop()
+
+		except RuntimeError :
+			return None
+
+	#処理の実行を終え、待っている呼び出し元に結果を渡す
+	@classmethod
+	def __end_flight(cls, key, future, result, exception):
+
+		with cls.inflight_lock :
+
+			del cls.inflight_dict[key]
+
+		if exception != None :
+			future.set_exception(exception)
+
+		else :
+			future.set_result(result)
+
+	@classmethod
+	def __read_local_file(cls, local_path):
+
+		fin = open(local_path, 'rb')
+		bdata = fin.read()
+		fin.close()
 
+		return bdata
@@ -0,0 +1,90 @@
+import copy
+import threading
+
+
+
+#XMLDataGetterの読み込み状況の統計
+#
+#どこからデータを取得したか(メモリ, webcache, ネットワーク, ローカルファイル)
+#読み込んだバイト数、解析時間、ネットワークの応答時間を集計する
+#提出書類毎の読み込みコストを計測する場合は、処理前にresetする
+class XMLDataStats():
+
+	def __init__(self):
+
+		self.__lock = threading.Lock()
+		self.reset()
+
+
+	def reset(self):
+
+		with self.__lock :
+
+			#取得元毎のヒット・ミス回数
+			#
+			#*_inflight_waitは、同じデータを取得中の他の呼び出しの結果を待った回数
+			#(メモリ上のキャッシュの場合は memory_hit + memory_miss + memory_inflight_wait が取得回数となる)
+			self.__count_dict = {'memory_hit' : 0, \
+						'memory_miss' : 0, \
+						'memory_inflight_wait' : 0, \
+						'webcache_hit' : 0, \
+						'webcache_miss' : 0, \
+						'webcache_inflight_wait' : 0, \
+						'webcache_not_modified' : 0, \
+						'network_request' : 0, \
+						'local_read' : 0}
+
+			#取得元毎の読み込みバイト数
+			self.__bytes_read_dict = {'webcache' : 0, \
+						'network' : 0, \
+						'local' : 0}
+
+			#データのパス -> 解析時間(秒)
+			self.__parse_time_dict = {}
+
+			#URL -> ネットワークの応答時間(秒)
+			self.__network_latency_dict = {}
+			self.__network_latency_max = 0.0
+
+
+	def count(self, name):
+
+		with self.__lock :
+
+			self.__count_dict[name] = self.__count_dict[name] + 1
+
+
+	def add_bytes_read(self, source, nbytes):
+
+		with self.__lock :
+
+			self.__bytes_read_dict[source] = self.__bytes_read_dict[source] + nbytes
+
+
+	def add_parse_time(self, data_path, seconds):
+
+		with self.__lock :
+
+			self.__parse_time_dict[data_path] = self.__parse_time_dict.get(data_path, 0.0) + seconds
+
+
+	def add_network_latency(self, url, seconds):
+
+		with self.__lock :
+
+			self.__network_latency_dict[url] = self.__network_latency_dict.get(url, 0.0) + seconds
+			self.__network_latency_max = max(self.__network_latency_max, seconds)
+
+
+	def to_dict(self):
+
+		with self.__lock :
+
+			return {'count' : copy.copy(self.__count_dict), \
+				'bytes_read' : copy.copy(self.__bytes_read_dict), \
+				'parse_time' : {'total' : sum(self.__parse_time_dict.values()), \
+						'documents' : copy.copy(self.__parse_time_dict)}, \
+				'network_latency' : {'count' : self.__count_dict['network_request'], \
+						'total' : sum(self.__network_latency_dict.values()), \
+						'max' : self.__network_latency_max, \
+						'urls' : copy.copy(self.__network_latency_dict)}}
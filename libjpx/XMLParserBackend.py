@@ -0,0 +1,370 @@
+from bs4 import BeautifulSoup
+from lxml import etree
+from abc import ABCMeta, abstractmethod
+import html
+import io
+import re
+
+
+
+#属性名の接頭辞と名前空間の対応
+#
+#BeautifulSoupでは属性名を'xlink:href'のように接頭辞付きで扱うため
+#lxmlでも同じ表記で属性を取得できるようにする
+ATTRIBUTE_NAMESPACE_DICT = {
+	'xlink' : 'http://www.w3.org/1999/xlink',
+	'xbrli' : 'http://www.xbrl.org/2003/instance',
+	'xsi' : 'http://www.w3.org/2001/XMLSchema-instance',
+	'xml' : 'http://www.w3.org/XML/1998/namespace',
+}
+
+
+#XMLファイルを解析するパーサーの共通インターフェース
+#
+#XMLDataGetterはこのインターフェースを通してXMLファイルを解析する
+#解析結果はXMLDocumentとして返す
+class XMLParserBackend(metaclass=ABCMeta):
+
+
+	#XMLファイルのバイト列を解析しXMLDocumentを返す
+	@abstractmethod
+	def parse(self, bdata) :
+		pass
+
+
+	#メモリマップなどのバッファを解析しXMLDocumentを返す
+	#
+	#バッファ全体をbytesに複製せずに解析する
+	@abstractmethod
+	def parse_buffer(self, buffer) :
+		pass
+
+
+	#XMLファイルのバイト列から指定したローカル名の要素を順に返す
+	#
+	#木構造全体を保持せずに要素を処理したい場合に用いる
+	#返された要素は次の要素を要求した時点で破棄される可能性があるため
+	#必要な値はその場で取り出すこと
+	@abstractmethod
+	def iter_elements(self, bdata, local_name_list) :
+		pass
+
+
+#解析結果の文書
+class XMLDocument(metaclass=ABCMeta):
+
+
+	#指定したローカル名の要素を全て取得する
+	@abstractmethod
+	def select(self, local_name) :
+		pass
+
+
+	#指定したローカル名の要素を1つ取得する
+	@abstractmethod
+	def select_one(self, local_name) :
+		pass
+
+
+#解析結果の要素
+class XMLElement(metaclass=ABCMeta):
+
+
+	#要素のローカル名(名前空間の接頭辞を除いた名称)を取得する
+	@abstractmethod
+	def get_local_name(self) :
+		pass
+
+
+	#属性値を取得する
+	#属性名は'xlink:href'のように接頭辞付きで指定する
+	@abstractmethod
+	def get(self, attr_name) :
+		pass
+
+
+	#子孫要素を含めたテキストを取得する
+	@abstractmethod
+	def get_text(self) :
+		pass
+
+
+	#要素直下の文字列を取得する
+	#子要素を含む場合はNoneを返す(BeautifulSoupのstringと同等)
+	@abstractmethod
+	def get_string(self) :
+		pass
+
+
+	#要素の内部をマークアップ付きの文字列として取得する(innerHtml)
+	@abstractmethod
+	def decode_contents(self) :
+		pass
+
+
+	#子孫要素から指定したローカル名の要素を全て取得する
+	@abstractmethod
+	def select(self, local_name) :
+		pass
+
+
+	#子孫要素から指定したローカル名の要素を1つ取得する
+	@abstractmethod
+	def select_one(self, local_name) :
+		pass
+
+
+
+#lxmlを用いたパーサー
+#
+#BeautifulSoupの木構造を生成しないため、解析時間とメモリ使用量が小さい
+class LxmlParserBackend(XMLParserBackend):
+
+	#parse_bufferで一度にパーサーに渡すバイト数
+	FEED_CHUNK_SIZE = 1024 * 1024
+
+
+	def parse(self, bdata) :
+
+		#空のファイルはBeautifulSoupと同様に要素の無い文書とする
+		if len(bdata) == 0 :
+			return LxmlXMLDocument(None)
+
+		root = etree.fromstring(bdata, LxmlParserBackend.create_parser())
+		return LxmlXMLDocument(root)
+
+
+	def parse_buffer(self, buffer) :
+
+		#一定サイズずつパーサーに渡すことで
+		#複製するのは渡している部分のみとする
+		parser = LxmlParserBackend.create_parser()
+
+		for offset in range(0, len(buffer), LxmlParserBackend.FEED_CHUNK_SIZE) :
+			parser.feed(buffer[offset:offset + LxmlParserBackend.FEED_CHUNK_SIZE])
+
+		return LxmlXMLDocument(parser.close())
+
+
+	def iter_elements(self, bdata, local_name_list) :
+
+		tag_list = ['{*}' + local_name for local_name in local_name_list]
+
+		for event, elem in etree.iterparse(io.BytesIO(bdata), events=('end',), tag=tag_list, huge_tree=True, recover=True, resolve_entities=False, no_network=True) :
+
+			yield LxmlXMLElement(elem)
+
+			#処理済みの要素を破棄してメモリ使用量を抑える
+			elem.clear(keep_tail=True)
+			while elem.getprevious() is not None :
+				del elem.getparent()[0]
+
+
+	@staticmethod
+	def create_parser() :
+
+		#BeautifulSoupと同様に多少壊れた文書も読み込めるようにしておく
+		return etree.XMLParser(huge_tree=True, recover=True, resolve_entities=False, no_network=True)
+
+
+class LxmlXMLDocument(XMLDocument):
+
+
+	#rootがNoneなら要素の無い文書とする
+	#(空のファイルや、recoverしても要素を読み取れなかったファイル)
+	def __init__(self, root) :
+
+		if root is None :
+			self.__root = None
+		else :
+			self.__root = LxmlXMLElement(root)
+
+
+	def get_root(self) :
+		return self.__root
+
+
+	def select(self, local_name) :
+
+		if self.__root == None :
+			return list()
+
+		return self.__root.select(local_name)
+
+
+	def select_one(self, local_name) :
+
+		if self.__root == None :
+			return None
+
+		return self.__root.select_one(local_name)
+
+
+class LxmlXMLElement(XMLElement):
+
+
+	def __init__(self, elem) :
+
+		self.__elem = elem
+
+
+	def get_lxml_element(self) :
+		return self.__elem
+
+
+	def get_local_name(self) :
+		return etree.QName(self.__elem).localname
+
+
+	def get(self, attr_name) :
+
+		#接頭辞付きの属性名は名前空間付きの名称に変換する
+		if ':' in attr_name :
+
+			prefix, local_name = attr_name.split(':', 1)
+			if prefix in ATTRIBUTE_NAMESPACE_DICT :
+
+				return self.__elem.get('{' + ATTRIBUTE_NAMESPACE_DICT[prefix] + '}' + local_name)
+
+		return self.__elem.get(attr_name)
+
+
+	def get_text(self) :
+		return ''.join(self.__elem.itertext())
+
+
+	def get_string(self) :
+
+		if len(self.__elem) == 0 :
+			return self.__elem.text
+
+		#子要素が1つだけなら子要素の文字列を返す
+		if len(self.__elem) == 1 and not self.__elem.text and not self.__elem[0].tail :
+			return LxmlXMLElement(self.__elem[0]).get_string()
+
+		return None
+
+
+	def decode_contents(self) :
+
+		contents_str_list = list()
+
+		if self.__elem.text != None :
+			contents_str_list.append(html.escape(self.__elem.text, quote=False))
+
+		for child in self.__elem :
+			contents_str_list.append(etree.tostring(child, encoding='unicode', with_tail=True))
+
+		#lxmlは子要素の文字列化の際に名前空間宣言を付与するため取り除く
+		return re.sub(r' xmlns(:[\w\-.]+)?="[^"]*"', '', ''.join(contents_str_list))
+
+
+	def select(self, local_name) :
+		return [LxmlXMLElement(elem) for elem in self.__elem.iter('{*}' + local_name)]
+
+
+	def select_one(self, local_name) :
+
+		for elem in self.__elem.iter('{*}' + local_name) :
+			return LxmlXMLElement(elem)
+
+		return None
+
+
+	def __str__(self) :
+		return etree.tostring(self.__elem, encoding='unicode')
+
+
+
+#BeautifulSoupを用いたパーサー
+#
+#従来の解析処理と同じ結果が必要な場合に用いる
+class SoupParserBackend(XMLParserBackend):
+
+
+	def parse(self, bdata) :
+
+		return SoupXMLDocument(BeautifulSoup(bdata, 'xml'))
+
+
+	def parse_buffer(self, buffer) :
+
+		#BeautifulSoupはバイト列しか受け付けないため複製する
+		return self.parse(bytes(buffer))
+
+
+	def iter_elements(self, bdata, local_name_list) :
+
+		#BeautifulSoupは逐次解析できないため文書全体を解析してから返す
+		soup = BeautifulSoup(bdata, 'xml')
+		for tag in soup.find_all(local_name_list) :
+			yield SoupXMLElement(tag)
+
+
+class SoupXMLDocument(XMLDocument):
+
+
+	def __init__(self, soup) :
+
+		self.__root = SoupXMLElement(soup)
+
+
+	def get_root(self) :
+		return self.__root
+
+
+	def select(self, local_name) :
+		return self.__root.select(local_name)
+
+
+	def select_one(self, local_name) :
+		return self.__root.select_one(local_name)
+
+
+class SoupXMLElement(XMLElement):
+
+
+	def __init__(self, tag) :
+
+		self.__tag = tag
+
+
+	def get_tag(self) :
+		return self.__tag
+
+
+	def get_local_name(self) :
+		return self.__tag.name
+
+
+	def get(self, attr_name) :
+		return self.__tag.get(attr_name)
+
+
+	def get_text(self) :
+		return self.__tag.get_text()
+
+
+	def get_string(self) :
+		return self.__tag.string
+
+
+	def decode_contents(self) :
+		return self.__tag.decode_contents()
+
+
+	def select(self, local_name) :
+		return [SoupXMLElement(tag) for tag in self.__tag.find_all(local_name)]
+
+
+	def select_one(self, local_name) :
+
+		tag = self.__tag.find(local_name)
+		if tag == None :
+			return None
+
+		return SoupXMLElement(tag)
+
+
+	def __str__(self) :
+		return self.__tag.prettify()
@@ -1,4 +1,8 @@
 from .JPXPath import JPXXbrlPath
 from .XBRLStructure import XBRLLinkBaseTree
+from .XBRLStructure import XBRLLinkBaseTreeSet
 from .XBRLStructure import XBRLInstanceFileAnalysis
-from .DisclosureFileDownloader import TDnetAnalyzer
\ No newline at end of file
+from .DisclosureFileDownloader import TDnetAnalyzer
+from .XMLDataGetter import XMLDataGetter
+from .XMLParserBackend import LxmlParserBackend
+from .XMLParserBackend import SoupParserBackend
\ No newline at end of file
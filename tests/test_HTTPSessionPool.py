@@ -0,0 +1,83 @@
+import asyncio
+import functools
+import gc
+import http.server
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libjpx import XMLDataGetter
+from libjpx.HTTPSessionPool import HTTPSessionPool, aiohttp
+
+
+pytestmark = pytest.mark.skipif(aiohttp == None, reason = 'aiohttp is not installed')
+
+
+@pytest.fixture
+def xml_server(tmp_path, monkeypatch):
+
+	serve_dir = tmp_path / 'srv'
+	serve_dir.mkdir()
+	for name in ['a.xml', 'b.xml'] :
+		(serve_dir / name).write_bytes(b'<?xml version="1.0"?><root/>')
+
+	#webcacheは作業ディレクトリに作成される
+	work_dir = tmp_path / 'work'
+	work_dir.mkdir()
+	monkeypatch.chdir(work_dir)
+
+	handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory = str(serve_dir))
+	handler.log_message = lambda *args : None
+
+	server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+	thread = threading.Thread(target = server.serve_forever, daemon = True)
+	thread.start()
+
+	XMLDataGetter.set_rate_limit(1000.0, 10)
+
+	yield 'http://127.0.0.1:%d/' % server.server_address[1]
+
+	XMLDataGetter.set_rate_limit(1.0, 1)
+	XMLDataGetter.clear_cache()
+
+	server.shutdown()
+	server.server_close()
+
+
+#asyncio.runの度にセッションが残り続けないこと
+def test_async_session_is_released_after_asyncio_run(xml_server):
+
+	for name in ['a.xml', 'b.xml'] :
+
+		fetched_url_list = asyncio.run(XMLDataGetter.aprefetch([xml_server + name]))
+		assert fetched_url_list == [xml_server + name]
+
+		gc.collect()
+		assert len(HTTPSessionPool.async_session_dict) <= 1
+
+	assert len(HTTPSessionPool.async_session_dict) == 0
+
+
+#入れ子になった範囲では、最後の範囲を抜けるまでセッションを閉じないこと
+def test_async_session_scope_is_reference_counted(xml_server):
+
+	async def run() :
+
+		async with HTTPSessionPool.async_session_scope() :
+
+			async with HTTPSessionPool.async_session_scope() :
+				await HTTPSessionPool.aget(xml_server + 'a.xml')
+
+			async_session = HTTPSessionPool.get_async_session()
+			assert not async_session.closed
+
+		return async_session
+
+	async_session = asyncio.run(run())
+
+	assert async_session.closed
+	assert len(HTTPSessionPool.async_session_dict) == 0
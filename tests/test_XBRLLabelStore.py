@@ -0,0 +1,241 @@
+import functools
+import http.server
+import os
+import pickle
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libjpx import XMLDataGetter
+from libjpx.XBRLLabelStore import XBRLLabelStore
+
+
+LABEL_ROLE = 'http://www.xbrl.org/2003/role/label'
+TOTAL_LABEL_ROLE = 'http://www.xbrl.org/2003/role/totalLabel'
+VERBOSE_LABEL_ROLE = 'http://www.xbrl.org/2003/role/verboseLabel'
+
+
+#同じ要素IDのlocが複数あり、同じ要素ID・ロールのラベルが複数ある名称リンクベース
+LAB_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<link:linkbase xmlns:link="http://www.xbrl.org/2003/linkbase" xmlns:xlink="http://www.w3.org/1999/xlink" xmlns:xml="http://www.w3.org/XML/1998/namespace">
+<link:labelLink xlink:type="extended" xlink:role="http://www.xbrl.org/2003/role/link">
+<link:loc xlink:type="locator" xlink:href="tst.xsd#tst_A" xlink:label="A1"/>
+<link:loc xlink:type="locator" xlink:href="tst.xsd#tst_B" xlink:label="B"/>
+<link:loc xlink:type="locator" xlink:href="tst.xsd#tst_A" xlink:label="A2"/>
+<link:loc xlink:type="locator" xlink:href="tst.xsd#tst_C" xlink:label="C"/>
+<link:label xlink:type="resource" xlink:label="label_A2" xlink:role="{label}" xml:lang="ja">A2ラベル</link:label>
+<link:label xlink:type="resource" xlink:label="label_A2_verbose" xlink:role="{verbose}" xml:lang="ja">A2冗長ラベル</link:label>
+<link:label xlink:type="resource" xlink:label="label_A1" xlink:role="{label}" xml:lang="ja">A1ラベル</link:label>
+<link:label xlink:type="resource" xlink:label="label_A1_total" xlink:role="{total}" xml:lang="ja">A1合計ラベル</link:label>
+<link:label xlink:type="resource" xlink:label="label_A1_second" xlink:role="{label}" xml:lang="ja">A1ラベル2</link:label>
+<link:label xlink:type="resource" xlink:label="label_B" xlink:role="{label}" xml:lang="ja">Bラベル</link:label>
+<link:label xlink:type="resource" xlink:label="label_B" xlink:role="{label}" xml:lang="ja">Bラベル2</link:label>
+<link:labelArc xlink:type="arc" xlink:arcrole="http://www.xbrl.org/2003/arcrole/concept-label" xlink:from="A2" xlink:to="label_A2"/>
+<link:labelArc xlink:type="arc" xlink:arcrole="http://www.xbrl.org/2003/arcrole/concept-label" xlink:from="A2" xlink:to="label_A2_verbose"/>
+<link:labelArc xlink:type="arc" xlink:arcrole="http://www.xbrl.org/2003/arcrole/concept-label" xlink:from="A1" xlink:to="label_A1"/>
+<link:labelArc xlink:type="arc" xlink:arcrole="http://www.xbrl.org/2003/arcrole/concept-label" xlink:from="A1" xlink:to="label_A1_total"/>
+<link:labelArc xlink:type="arc" xlink:arcrole="http://www.xbrl.org/2003/arcrole/concept-label" xlink:from="A1" xlink:to="label_A1_second"/>
+<link:labelArc xlink:type="arc" xlink:arcrole="http://www.xbrl.org/2003/arcrole/concept-label" xlink:from="B" xlink:to="label_B"/>
+</link:labelLink>
+</link:linkbase>
+'''.format(label = LABEL_ROLE, total = TOTAL_LABEL_ROLE, verbose = VERBOSE_LABEL_ROLE)
+
+
+@pytest.fixture
+def labfile(tmp_path, monkeypatch):
+
+	#labelstoreは作業ディレクトリに作成される
+	monkeypatch.chdir(tmp_path)
+
+	labfile = str(tmp_path / 'tst-lab.xml')
+	with open(labfile, 'w', encoding = 'utf-8') as f :
+		f.write(LAB_XML)
+
+	yield labfile
+
+	XBRLLabelStore.clear_cache()
+	XMLDataGetter.clear_cache()
+
+
+#ラベルはlocの出現順、labelArcの出現順、labelの出現順に並ぶこと
+def test_label_tuple_list_is_in_linkbase_order(labfile):
+
+	store = XBRLLabelStore.open_store(labfile)
+
+	assert store.get_label_tuple_list() == [ \
+			('tst_A', LABEL_ROLE, 'A1ラベル'), \
+			('tst_A', TOTAL_LABEL_ROLE, 'A1合計ラベル'), \
+			('tst_A', LABEL_ROLE, 'A1ラベル2'), \
+			('tst_B', LABEL_ROLE, 'Bラベル'), \
+			('tst_B', LABEL_ROLE, 'Bラベル2'), \
+			('tst_A', LABEL_ROLE, 'A2ラベル'), \
+			('tst_A', VERBOSE_LABEL_ROLE, 'A2冗長ラベル')]
+
+
+#同じ要素ID・ロールのラベルが複数ある場合は先に出現したものを用いること
+def test_first_label_wins_for_duplicate_id_and_role(labfile):
+
+	store = XBRLLabelStore.open_store(labfile)
+
+	assert store['tst_A'] == {LABEL_ROLE : 'A1ラベル', TOTAL_LABEL_ROLE : 'A1合計ラベル', VERBOSE_LABEL_ROLE : 'A2冗長ラベル'}
+	assert store['tst_B'] == {LABEL_ROLE : 'Bラベル'}
+
+	assert 'tst_A' in store
+	assert 'tst_C' not in store
+	assert len(store) == 2
+	assert list(store) == ['tst_A', 'tst_B']
+
+	with pytest.raises(KeyError) :
+		store['tst_C']
+
+
+#作成済みのラベル格納ファイルは作り直さずに開くこと
+def test_existing_store_file_is_reused(labfile):
+
+	store_file_path = XBRLLabelStore.open_store(labfile).get_store_file_path()
+	modified_time = os.path.getmtime(store_file_path)
+
+	XBRLLabelStore.clear_cache()
+	store = XBRLLabelStore.open_store(labfile)
+
+	assert store.get_store_file_path() == store_file_path
+	assert os.path.getmtime(store_file_path) == modified_time
+	assert store['tst_B'] == {LABEL_ROLE : 'Bラベル'}
+
+
+#名称リンクベースファイルの読み込み回数を数える
+@pytest.fixture
+def read_path_list(monkeypatch):
+
+	read_path_list = list()
+	original_get_bytes = XMLDataGetter.get_bytes
+
+	def get_bytes(cls, data_path) :
+
+		read_path_list.append(data_path)
+		return original_get_bytes(data_path)
+
+	monkeypatch.setattr(XMLDataGetter, 'get_bytes', classmethod(get_bytes))
+
+	return read_path_list
+
+
+#ローカルファイルのサイズ・更新時刻が変わらなければ、別のプロセスでもファイルを読み込まずに開くこと
+def test_local_labfile_is_not_read_again(labfile, read_path_list):
+
+	store_file_path = XBRLLabelStore.open_store(labfile).get_store_file_path()
+	read_count = len(read_path_list)
+
+	#別のプロセスで開いた場合と同様にプロセス内のキャッシュを破棄する
+	XBRLLabelStore.clear_cache()
+	XMLDataGetter.clear_cache()
+
+	store = XBRLLabelStore.open_store(labfile)
+
+	assert store.get_store_file_path() == store_file_path
+	assert len(read_path_list) == read_count
+
+
+	#内容が変わったら別のラベル格納ファイルを作成する
+	with open(labfile, 'w', encoding = 'utf-8') as f :
+		f.write(LAB_XML.replace('Bラベル2', 'Bラベル2改'))
+
+	XBRLLabelStore.clear_cache()
+	store = XBRLLabelStore.open_store(labfile)
+
+	assert store.get_store_file_path() != store_file_path
+	assert store.get_label_tuple_list()[4] == ('tst_B', LABEL_ROLE, 'Bラベル2改')
+
+
+#URLの名称リンクベースファイルはwebcacheに記録したハッシュ値を用い、本体を読み込まずに開くこと
+def test_web_labfile_uses_webcache_content_hash(labfile, monkeypatch):
+
+	handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory = os.path.dirname(labfile))
+	handler.log_message = lambda *args : None
+
+	server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+	thread = threading.Thread(target = server.serve_forever, daemon = True)
+	thread.start()
+
+	XMLDataGetter.set_rate_limit(1000.0, 10)
+
+	try :
+
+		url = 'http://127.0.0.1:%d/tst-lab.xml' % server.server_address[1]
+
+		store_file_path = XBRLLabelStore.open_store(url).get_store_file_path()
+
+		XBRLLabelStore.clear_cache()
+		XMLDataGetter.clear_cache()
+		XMLDataGetter.reset_stats()
+
+		read_url_list = list()
+		original_read = XMLDataGetter.web_cache.read
+		monkeypatch.setattr(XMLDataGetter.web_cache, 'read', lambda url : read_url_list.append(url) or original_read(url))
+
+		store = XBRLLabelStore.open_store(url)
+
+		assert store.get_store_file_path() == store_file_path
+		assert store['tst_B'] == {LABEL_ROLE : 'Bラベル'}
+		assert read_url_list == list()
+		assert XMLDataGetter.get_stats()['count'].get('network_request', 0) == 0
+
+	finally :
+
+		XMLDataGetter.set_rate_limit(1.0, 1)
+
+		server.shutdown()
+		server.server_close()
+
+
+#pickleした場合は接続を含めず、復元後に開き直すこと
+def test_pickled_store_reopens_connection(labfile):
+
+	store = XBRLLabelStore.open_store(labfile)
+	assert store['tst_B'] == {LABEL_ROLE : 'Bラベル'}
+
+	restored_store = pickle.loads(pickle.dumps(store))
+
+	assert restored_store.get_store_file_path() == store.get_store_file_path()
+	assert restored_store['tst_A'] == store['tst_A']
+
+
+#fork後の子プロセスでは親プロセスの接続を用いず開き直し、親プロセスの接続に影響しないこと
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason = 'os.fork is not available')
+def test_store_reopens_after_fork(labfile):
+
+	store = XBRLLabelStore.open_store(labfile)
+	assert store['tst_B'] == {LABEL_ROLE : 'Bラベル'}
+
+	read_fd, write_fd = os.pipe()
+
+	pid = os.fork()
+	if pid == 0 :
+
+		exit_code = 1
+
+		try :
+
+			os.close(read_fd)
+			os.write(write_fd, store['tst_A'][LABEL_ROLE].encode('utf-8'))
+			store.close()
+			exit_code = 0
+
+		finally :
+			os._exit(exit_code)
+
+
+	os.close(write_fd)
+
+	with os.fdopen(read_fd, 'rb') as f :
+		child_result = f.read().decode('utf-8')
+
+	_, status = os.waitpid(pid, 0)
+
+	assert os.waitstatus_to_exitcode(status) == 0
+	assert child_result == 'A1ラベル'
+
+	assert store['tst_A'][TOTAL_LABEL_ROLE] == 'A1合計ラベル'
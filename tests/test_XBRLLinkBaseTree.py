@@ -0,0 +1,387 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libjpx import JPXXbrlPath, XBRLLinkBaseTree, XMLDataGetter
+from libjpx.JPXError import JPXAnalysisError
+
+
+ROL_ID = 'rol_ConsolidatedBalanceSheet'
+
+
+@pytest.fixture(autouse = True)
+def clear_xml_cache():
+
+	yield
+
+	XMLDataGetter.clear_cache()
+
+
+#同じ要素を指すlocが複数あり、arcの出現順が親子の順序と一致しない定義リンクベースを作る
+#
+#戻り値は(locのラベル -> 要素ID, (親のラベル, 子のラベル, 順序)のリスト)
+def make_def_linkbase(seed, xbrl_dir_path):
+
+	r = random.Random(seed)
+
+	label_count = r.randint(3, 14)
+	concept_count = max(2, r.randint(label_count // 3, label_count))
+
+	label_list = ['L%d' % i for i in range(label_count)]
+	concept_dict = {label : 'c%d' % r.randint(0, concept_count - 1) for label in label_list}
+	concept_dict['L0'] = 'head'
+
+	arc_list = list()
+	for i in range(1, label_count) :
+
+		if r.random() < 0.85 :
+
+			arc_list.append((label_list[r.randint(0, i - 1)], label_list[i], r.randint(1, 4)))
+
+			#親を2つ持つノード
+			if r.random() < 0.1 :
+				arc_list.append((label_list[r.randint(0, i - 1)], label_list[i], r.randint(1, 4)))
+
+	r.shuffle(arc_list)
+
+
+	line_list = ['<?xml version="1.0" encoding="UTF-8"?>', \
+			'<link:linkbase xmlns:link="http://www.xbrl.org/2003/linkbase" xmlns:xlink="http://www.w3.org/1999/xlink">', \
+			'<link:roleRef roleURI="http://example/role/%s" xlink:type="simple" xlink:href="tst.xsd#%s"/>' % (ROL_ID, ROL_ID), \
+			'<link:definitionLink xlink:type="extended" xlink:role="http://example/role/%s">' % ROL_ID]
+
+	for label in label_list :
+		line_list.append('<link:loc xlink:type="locator" xlink:href="tst.xsd#%s" xlink:label="%s"/>' % (concept_dict[label], label))
+
+	for parent_label, child_label, order in arc_list :
+		line_list.append('<link:definitionArc xlink:type="arc" xlink:arcrole="http://xbrl.org/int/dim/arcrole/domain-member" ' \
+				'xlink:from="%s" xlink:to="%s" order="%d"/>' % (parent_label, child_label, order))
+
+	line_list += ['</link:definitionLink>', '</link:linkbase>']
+
+
+	os.makedirs(xbrl_dir_path)
+	with open(os.path.join(xbrl_dir_path, 'tst_def.xml'), 'w', encoding = 'utf-8') as f :
+		f.write('\n'.join(line_list))
+
+	return concept_dict, arc_list
+
+
+class CyclicTreeError(Exception) :
+	pass
+
+
+class ReferenceNode() :
+
+	def __init__(self, id) :
+
+		self.id = id
+		self.order = None
+		self.parent = None
+		self.children = list()
+
+
+#変更前の親無しノードの再構成処理をそのまま辿り、大項目以下の(深さ, 要素ID, 順序)のリストを返す
+#
+#親無しノードを1つ挿入する毎に、出現順で最初の親無しノードから挿入先を探し直す
+#挿入先により木構造が循環する場合はCyclicTreeErrorとする
+def build_reference_structure(concept_dict, arc_list):
+
+	tree_dict = {}
+	for parent_label, child_label, order in arc_list :
+
+		parent = tree_dict.setdefault(parent_label, ReferenceNode(concept_dict[parent_label]))
+		child = tree_dict.setdefault(child_label, ReferenceNode(concept_dict[child_label]))
+
+		child.order = order
+		child.parent = parent
+		parent.children.append(child)
+
+	#root以外に要素がない
+	if len(tree_dict) == 0 :
+		return list()
+
+	no_parent_node_list = [node for node in tree_dict.values() if node.parent == None]
+
+
+	def search(node, id, path) :
+
+		if node in path :
+			raise CyclicTreeError()
+
+		for index, child in enumerate(node.children) :
+			if child.id == id :
+				return node, index
+
+		for child in node.children :
+
+			result_tuple = search(child, id, path + [node])
+			if result_tuple[0] != None :
+				return result_tuple
+
+		return None, -1
+
+
+	heading_node_list = list()
+	for candidate in no_parent_node_list :
+
+		if all(search(node, candidate.id, [])[0] == None for node in no_parent_node_list if node is not candidate) :
+			heading_node_list.append(candidate)
+
+	if len(heading_node_list) == 0 :
+		raise JPXAnalysisError('heading node is not exists')
+
+
+	for order, heading_node in enumerate(heading_node_list, 1) :
+
+		heading_node.order = order
+		no_parent_node_list.remove(heading_node)
+
+		while True :
+
+			result_tuple = (None, -1)
+			for source_node in no_parent_node_list :
+
+				result_tuple = search(heading_node, source_node.id, [])
+				if result_tuple[0] != None :
+					break
+
+			if result_tuple[0] == None :
+				break
+
+			node, index = result_tuple
+			source_node.order = node.children[index].order
+			source_node.parent = node.children[index].parent
+			node.children[index] = source_node
+
+			no_parent_node_list.remove(source_node)
+
+	if len(no_parent_node_list) != 0 :
+		raise JPXAnalysisError('親無しノードが余りました')
+
+
+	structure_list = list()
+
+	def walk(node, depth) :
+
+		if depth > len(tree_dict) :
+			raise CyclicTreeError()
+
+		structure_list.append((depth, node.id, node.order))
+		for child in sorted(node.children, key = lambda child : child.order) :
+			walk(child, depth + 1)
+
+	for heading_node in heading_node_list :
+		walk(heading_node, 0)
+
+	return structure_list
+
+
+def get_structure(tree):
+
+	structure_list = list()
+
+	def walk(node, depth) :
+
+		structure_list.append((depth, node.get_id(), node.get_order()))
+		for child in node.get_children() :
+			walk(child, depth + 1)
+
+	for heading_node in tree.search_node(ROL_ID).get_children() :
+		walk(heading_node, 0)
+
+	return structure_list
+
+
+#親無しノードの再構成結果が変更前の処理と一致すること
+#同じ要素を指すlocが複数ある場合、同じidの挿入先を後の親無しノードで置き換える場合を含む
+def test_attach_no_parent_node_matches_reference(tmp_path):
+
+	compared_count = 0
+
+	for seed in range(300) :
+
+		xbrl_dir_path = str(tmp_path / ('f%d' % seed))
+		concept_dict, arc_list = make_def_linkbase(seed, xbrl_dir_path)
+
+		try :
+			expected = build_reference_structure(concept_dict, arc_list)
+
+		#変更前の処理も終わらない
+		except CyclicTreeError :
+			continue
+
+		except JPXAnalysisError :
+
+			with pytest.raises(JPXAnalysisError) :
+				XBRLLinkBaseTree('definition', JPXXbrlPath(xbrl_dir_path))
+
+			continue
+
+
+		tree = XBRLLinkBaseTree('definition', JPXXbrlPath(xbrl_dir_path))
+		assert get_structure(tree) == expected, 'seed %d' % seed
+
+		compared_count = compared_count + 1
+
+	assert compared_count > 250
+
+
+#スナップショットにはインスタンス文書から読み込んだ値を含めず、保存元の木構造の値は変更しないこと
+def test_save_snapshot_does_not_contain_instance_values(tmp_path, monkeypatch):
+
+	#treecacheは作業ディレクトリに作成される
+	monkeypatch.chdir(tmp_path)
+
+	xbrl_dir_path = str(tmp_path / 'filing')
+	make_def_linkbase(0, xbrl_dir_path)
+
+	xbrl_path_data = JPXXbrlPath(xbrl_dir_path)
+	tree = XBRLLinkBaseTree('definition', xbrl_path_data)
+
+	node_list = list(tree.walk())
+	for node in node_list :
+		node.set_xbrl_data('instance value of ' + str(node.get_id()))
+
+	snapshot_file_path = tree.save_snapshot()
+
+	with open(snapshot_file_path, 'rb') as f :
+		assert b'instance value of' not in f.read()
+
+	assert all(node.get_xbrl_data() == 'instance value of ' + str(node.get_id()) for node in node_list)
+
+
+	snapshot_tree = XBRLLinkBaseTree.load_snapshot('definition', xbrl_path_data)
+
+	assert get_structure(snapshot_tree) == get_structure(tree)
+	assert all(node.get_xbrl_data() == None for node in snapshot_tree.walk())
+
+
+#子を持たないノードのget_childrenは変更しても他のノードに影響しないリストを返すこと
+def test_get_children_of_leaf_returns_new_list(tmp_path):
+
+	xbrl_dir_path = str(tmp_path / 'filing')
+	make_def_linkbase(0, xbrl_dir_path)
+
+	tree = XBRLLinkBaseTree('definition', JPXXbrlPath(xbrl_dir_path))
+	leaf_node_list = [node for node in tree.walk() if len(node.get_children()) == 0]
+
+	assert len(leaf_node_list) >= 2
+
+	children = leaf_node_list[0].get_children()
+	assert children == list()
+
+	children.append(leaf_node_list[1])
+	assert all(node.get_children() == list() for node in leaf_node_list)
+
+
+def walk_recursively(node, order, node_list):
+
+	if order == 'pre' :
+		node_list.append(node)
+
+	for child in node.get_children() :
+		walk_recursively(child, order, node_list)
+
+	if order == 'post' :
+		node_list.append(node)
+
+	return node_list
+
+
+def walk_level(node):
+
+	node_list = list()
+
+	level_node_list = [node]
+	while len(level_node_list) != 0 :
+
+		node_list.extend(level_node_list)
+		level_node_list = [child for level_node in level_node_list for child in level_node.get_children()]
+
+	return node_list
+
+
+#walkは再帰で辿った場合と同じ順に巡回すること
+def test_walk_matches_recursive_walk(tmp_path):
+
+	for seed in range(20) :
+
+		xbrl_dir_path = str(tmp_path / ('f%d' % seed))
+		make_def_linkbase(seed, xbrl_dir_path)
+
+		try :
+			tree = XBRLLinkBaseTree('definition', JPXXbrlPath(xbrl_dir_path))
+		except JPXAnalysisError :
+			continue
+
+		root_node = tree.get_root_node()
+
+		assert list(tree.walk()) == walk_recursively(root_node, 'pre', list())
+		assert list(tree.walk(order = 'post')) == walk_recursively(root_node, 'post', list())
+		assert list(tree.walk(order = 'level')) == walk_level(root_node)
+		assert list(tree) == list(tree.walk())
+
+		rol_node = tree.search_node(ROL_ID)
+		assert list(tree.walk(rol_node)) == walk_recursively(rol_node, 'pre', list())
+
+	with pytest.raises(ValueError) :
+		list(tree.walk(order = 'in'))
+
+
+#巡回を入れ子にしても互いに影響しないこと
+def test_nested_iteration_is_independent(tmp_path):
+
+	xbrl_dir_path = str(tmp_path / 'filing')
+	make_def_linkbase(0, xbrl_dir_path)
+
+	tree = XBRLLinkBaseTree('definition', JPXXbrlPath(xbrl_dir_path))
+
+	node_list = list(tree)
+	pair_list = [(outer_node, inner_node) for outer_node in tree for inner_node in tree]
+
+	assert pair_list == [(outer_node, inner_node) for outer_node in node_list for inner_node in node_list]
+
+
+	#set_walking_rootは次の巡回1回分のみ有効
+	rol_node = tree.search_node(ROL_ID)
+	tree.set_walking_root(rol_node)
+
+	assert list(tree) == list(tree.walk(rol_node))
+	assert list(tree) == node_list
+
+
+#idの索引による検索は木構造を巡回して探した場合と同じ結果になること
+@pytest.mark.parametrize('lazy', [False, True])
+def test_search_node_matches_walk(tmp_path, lazy):
+
+	for seed in range(20) :
+
+		xbrl_dir_path = str(tmp_path / ('f%d' % seed))
+		make_def_linkbase(seed, xbrl_dir_path)
+
+		#lazyなら大項目は検索時に構築される
+		try :
+			tree = XBRLLinkBaseTree('definition', JPXXbrlPath(xbrl_dir_path), lazy)
+			rol_node = tree.search_node(ROL_ID)
+		except JPXAnalysisError :
+			continue
+
+		for id in set(node.get_id() for node in tree.walk()) :
+
+			walked_node_list = [node for node in tree.walk() if node.get_id() == id]
+			rol_walked_node_list = [node for node in tree.walk(rol_node) if node.get_id() == id]
+
+			assert tree.search_node_list(id) == walked_node_list
+			assert tree.search_node_list(id, ROL_ID) == rol_walked_node_list
+
+			if id not in ('root', ROL_ID) :
+				assert tree.search_node(id) is walked_node_list[-1]
+
+		assert tree.search_node('not_exists') == None
+		assert tree.search_node_list('not_exists') == list()
+		assert tree.search_node_list('head', 'rol_not_exists') == list()
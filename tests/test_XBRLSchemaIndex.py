@@ -0,0 +1,85 @@
+import glob
+import logging
+import os
+import pickle
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libjpx import XMLDataGetter
+from libjpx.XBRLSchemaIndex import XBRLSchemaIndex
+from libjpx.XBRLConceptTable import XBRLConceptTable
+
+
+XSD_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<xsd:schema xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:xbrli="http://www.xbrl.org/2003/instance" xmlns:xbrldt="http://xbrl.org/2005/xbrldt" targetNamespace="http://example/tst">
+<xsd:element id="tst_BalanceSheetHeading" name="BalanceSheetHeading" type="xbrli:stringItemType" substitutionGroup="xbrldt:identifierItem" abstract="true" nillable="true" xbrli:periodType="duration"/>
+<xsd:element id="tst_AssetsAbstract" name="AssetsAbstract" type="xbrli:stringItemType" substitutionGroup="xbrli:item" abstract="true" nillable="true" xbrli:periodType="duration"/>
+<xsd:element id="tst_Assets" name="Assets" type="xbrli:monetaryItemType" substitutionGroup="xbrli:item" abstract="false" nillable="true" xbrli:periodType="instant"/>
+</xsd:schema>
+'''
+
+
+#壊れたpickleファイルの内容
+BROKEN_DATA_LIST = [b'', b'not a pickle', pickle.dumps((1, ))[:-3], pickle.dumps(123)]
+
+
+@pytest.fixture
+def schema_file(tmp_path, monkeypatch):
+
+	#schemaindexは作業ディレクトリに作成される
+	monkeypatch.chdir(tmp_path)
+
+	schema_file = str(tmp_path / 'tst.xsd')
+	with open(schema_file, 'w', encoding = 'utf-8') as f :
+		f.write(XSD_XML)
+
+	yield schema_file
+
+	XBRLSchemaIndex.clear_cache()
+	XBRLConceptTable.clear_cache()
+	XMLDataGetter.clear_cache()
+
+
+#索引ファイルが壊れていれば警告を出して作り直すこと
+@pytest.mark.parametrize('broken_data', BROKEN_DATA_LIST)
+def test_broken_schema_index_is_rebuilt(schema_file, caplog, broken_data):
+
+	element_table = XBRLSchemaIndex.get_element_table(schema_file)
+
+	index_file_path, = glob.glob(os.path.join('schemaindex', 'schema_index_*'))
+	with open(index_file_path, 'wb') as f :
+		f.write(broken_data)
+
+	XBRLSchemaIndex.clear_cache()
+
+	with caplog.at_level(logging.WARNING) :
+		assert XBRLSchemaIndex.get_element_table(schema_file) == element_table
+
+	assert 'broken schema index' in caplog.text
+
+	with open(index_file_path, 'rb') as f :
+		assert pickle.load(f)[1] == element_table
+
+
+#分類表ファイルが壊れていれば警告を出して作り直すこと
+@pytest.mark.parametrize('broken_data', BROKEN_DATA_LIST)
+def test_broken_concept_table_is_rebuilt(schema_file, caplog, broken_data):
+
+	concept_table = XBRLConceptTable.get_concept_table(schema_file)
+
+	table_file_path, = glob.glob(os.path.join('schemaindex', 'concept_table_*'))
+	with open(table_file_path, 'wb') as f :
+		f.write(broken_data)
+
+	XBRLConceptTable.clear_cache()
+
+	with caplog.at_level(logging.WARNING) :
+		assert XBRLConceptTable.get_concept_table(schema_file) == concept_table
+
+	assert 'broken concept table' in caplog.text
+
+	with open(table_file_path, 'rb') as f :
+		assert pickle.load(f)[1] == concept_table
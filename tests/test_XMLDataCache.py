@@ -0,0 +1,138 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libjpx.XMLDataCache import XMLDataCache
+
+
+#上限を超えたら最も長く使われていないエントリから破棄すること
+def test_least_recently_used_entry_is_evicted():
+
+	cache = XMLDataCache(max_entries = 2)
+
+	cache.put('a', 'A')
+	cache.put('b', 'B')
+
+	#参照したエントリは最近使われたものとなる
+	assert cache.get('a') == 'A'
+
+	cache.put('c', 'C')
+
+	assert 'a' in cache
+	assert 'b' not in cache
+	assert 'c' in cache
+	assert len(cache) == 2
+
+
+#推定バイト数の上限を超えたら破棄し、同じキーで登録し直した場合は古いバイト数を差し引くこと
+def test_byte_limit_and_total_bytes():
+
+	cache = XMLDataCache(max_bytes = 100)
+
+	cache.put('a', 'A', 40)
+	cache.put('b', 'B', 40)
+	cache.put('a', 'A2', 50)
+
+	assert cache.get_total_bytes() == 90
+	assert cache.get('a') == 'A2'
+
+	cache.put('c', 'C', 30)
+
+	assert 'b' not in cache
+	assert cache.get_total_bytes() == 80
+
+	assert cache.pop('a') == 'A2'
+	assert cache.get_total_bytes() == 30
+
+
+#固定されたエントリは、固定されていないエントリが無くなるまで破棄しないこと
+def test_pinned_entry_is_evicted_last():
+
+	cache = XMLDataCache(max_entries = 2)
+
+	cache.pin('schema')
+	cache.put('schema', 'S')
+	cache.put('a', 'A')
+	cache.put('b', 'B')
+
+	assert 'schema' in cache
+	assert 'a' not in cache
+	assert 'b' in cache
+
+	#固定されていないエントリを登録した場合は、そのエントリが破棄される
+	cache.pin('b')
+	cache.put('c', 'C')
+
+	assert 'c' not in cache
+	assert len(cache) == 2
+
+	#固定されたエントリのみの場合は、その中で最も長く使われていないものから破棄する
+	cache.set_limit(max_entries = 1)
+
+	assert 'schema' not in cache
+	assert 'b' in cache
+
+
+#前方一致で固定でき、登録済みのエントリにも適用されること
+def test_pin_prefix():
+
+	cache = XMLDataCache(max_entries = 2)
+
+	cache.put('http://taxonomy/a.xsd', 'T')
+	cache.pin_prefix('http://taxonomy/')
+
+	assert cache.is_pinned('http://taxonomy/a.xsd')
+	assert cache.is_pinned('http://taxonomy/b.xsd')
+	assert not cache.is_pinned('http://filing/a.xsd')
+
+	cache.put('http://filing/a.xsd', 'F1')
+	cache.put('http://filing/b.xsd', 'F2')
+
+	assert 'http://taxonomy/a.xsd' in cache
+	assert 'http://filing/a.xsd' not in cache
+
+
+#固定を解除したエントリは通常のエントリと同様に破棄されること
+def test_unpin():
+
+	cache = XMLDataCache(max_entries = 2)
+
+	cache.pin('a')
+	cache.put('a', 'A')
+	cache.put('b', 'B')
+
+	#固定を解除したエントリは最近使われたものとして扱う
+	cache.unpin('a')
+	assert not cache.is_pinned('a')
+
+	cache.put('c', 'C')
+
+	assert 'a' in cache
+	assert 'b' not in cache
+
+	cache.put('d', 'D')
+
+	assert 'a' not in cache
+	assert 'c' in cache
+
+
+#keep_pinnedを指定した場合は固定されたエントリのみ残すこと
+def test_clear_keep_pinned():
+
+	cache = XMLDataCache()
+
+	cache.pin('a')
+	cache.put('a', 'A', 10)
+	cache.put('b', 'B', 20)
+
+	cache.clear(keep_pinned = True)
+
+	assert 'a' in cache
+	assert 'b' not in cache
+	assert cache.get_total_bytes() == 10
+
+	cache.clear()
+
+	assert len(cache) == 0
+	assert cache.get_total_bytes() == 0
@@ -0,0 +1,351 @@
+import asyncio
+import functools
+import hashlib
+import http.server
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libjpx import XMLDataGetter
+from libjpx.HTTPSessionPool import aiohttp
+from libjpx.JPXError import JPXAnalysisError
+
+
+XML_BYTES = b'<?xml version="1.0"?><root><item>1</item></root>'
+
+
+#応答を遅らせて、取得処理が実行中の状態を作れるようにする
+#
+#受け取ったリクエストのパスを記録する
+#error_statusを設定した場合はそのステータスを返す
+class SlowHandler(http.server.SimpleHTTPRequestHandler) :
+
+	delay = 0.0
+	error_status = None
+	request_path_list = list()
+
+	def do_GET(self) :
+
+		self.request_path_list.append(self.path)
+		time.sleep(self.delay)
+
+		if self.error_status != None :
+
+			self.send_error(self.error_status)
+			return
+
+		super().do_GET()
+
+	def log_message(self, *args) :
+		pass
+
+
+@pytest.fixture
+def slow_server(tmp_path, monkeypatch):
+
+	serve_dir = tmp_path / 'srv'
+	serve_dir.mkdir()
+	(serve_dir / 'a.xml').write_bytes(XML_BYTES)
+
+	#webcacheは作業ディレクトリに作成される
+	work_dir = tmp_path / 'work'
+	work_dir.mkdir()
+	monkeypatch.chdir(work_dir)
+
+	handler = functools.partial(SlowHandler, directory = str(serve_dir))
+	monkeypatch.setattr(SlowHandler, 'delay', 0.5)
+	monkeypatch.setattr(SlowHandler, 'error_status', None)
+	monkeypatch.setattr(SlowHandler, 'request_path_list', list())
+
+	server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+	thread = threading.Thread(target = server.serve_forever, daemon = True)
+	thread.start()
+
+	XMLDataGetter.set_rate_limit(1000.0, 10)
+	XMLDataGetter.reset_stats()
+
+	yield 'http://127.0.0.1:%d/' % server.server_address[1]
+
+	XMLDataGetter.set_rate_limit(1.0, 1)
+	XMLDataGetter.clear_cache()
+
+	server.shutdown()
+	server.server_close()
+
+
+#ETag, Last-Modifiedを返し、条件付きリクエストに304で応答する
+#
+#modeが'error'なら500を返し、'drop'なら応答せずに接続を閉じる
+class ValidatorHandler(http.server.BaseHTTPRequestHandler) :
+
+	mode = 'ok'
+	etag = '"v1"'
+	last_modified = 'Wed, 01 Jan 2025 00:00:00 GMT'
+
+	#受け取ったリクエストのヘッダーのリスト
+	request_header_list = list()
+
+	def do_GET(self) :
+
+		self.request_header_list.append(dict(self.headers))
+
+		if self.mode == 'drop' :
+
+			self.close_connection = True
+			return
+
+		if self.mode == 'error' :
+
+			self.send_response(500)
+			self.send_header('Content-Length', '0')
+			self.end_headers()
+			return
+
+		if self.headers.get('If-None-Match') == self.etag :
+
+			self.send_response(304)
+			self.end_headers()
+			return
+
+		self.send_response(200)
+		self.send_header('Content-Type', 'application/xml')
+		self.send_header('Content-Length', str(len(XML_BYTES)))
+		self.send_header('ETag', self.etag)
+		self.send_header('Last-Modified', self.last_modified)
+		self.end_headers()
+		self.wfile.write(XML_BYTES)
+
+	def log_message(self, *args) :
+		pass
+
+
+@pytest.fixture
+def validator_server(tmp_path, monkeypatch):
+
+	#webcacheは作業ディレクトリに作成される
+	monkeypatch.chdir(tmp_path)
+
+	monkeypatch.setattr(ValidatorHandler, 'mode', 'ok')
+	monkeypatch.setattr(ValidatorHandler, 'request_header_list', list())
+
+	server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), ValidatorHandler)
+	thread = threading.Thread(target = server.serve_forever, daemon = True)
+	thread.start()
+
+	XMLDataGetter.set_rate_limit(1000.0, 10)
+	XMLDataGetter.reset_stats()
+
+	yield 'http://127.0.0.1:%d/' % server.server_address[1]
+
+	XMLDataGetter.set_rate_limit(1.0, 1)
+	XMLDataGetter.set_webcache_max_age(None)
+	XMLDataGetter.clear_cache()
+
+	server.shutdown()
+	server.server_close()
+
+
+def get_item_list(url):
+	return [elm.get_string() for elm in XMLDataGetter.get(url).select('item')]
+
+
+#有効期間を過ぎたwebcacheはETag, Last-Modifiedで再検証し、304ならダウンロードせずに使うこと
+def test_stale_webcache_is_revalidated_with_validators(validator_server):
+
+	url = validator_server + 'a.xml'
+
+	assert get_item_list(url) == ['1']
+
+	meta_dict = XMLDataGetter.web_cache.read_meta(url)
+	assert meta_dict['etag'] == ValidatorHandler.etag
+	assert meta_dict['last_modified'] == ValidatorHandler.last_modified
+
+
+	XMLDataGetter.clear_cache()
+	XMLDataGetter.set_webcache_max_age(0)
+	time.sleep(0.01)
+
+	assert get_item_list(url) == ['1']
+
+	assert len(ValidatorHandler.request_header_list) == 2
+	assert ValidatorHandler.request_header_list[1].get('If-None-Match') == ValidatorHandler.etag
+	assert ValidatorHandler.request_header_list[1].get('If-Modified-Since') == ValidatorHandler.last_modified
+
+	count_dict = XMLDataGetter.get_stats()['count']
+	assert count_dict['webcache_miss'] == 2
+	assert count_dict['webcache_not_modified'] == 1
+	assert XMLDataGetter.web_cache.read_meta(url)['fetched_time'] > meta_dict['fetched_time']
+
+
+#有効期間内のwebcacheは再検証しないこと
+def test_fresh_webcache_is_not_revalidated(validator_server):
+
+	url = validator_server + 'a.xml'
+
+	assert get_item_list(url) == ['1']
+
+	XMLDataGetter.clear_cache()
+	XMLDataGetter.set_webcache_max_age(3600)
+
+	assert get_item_list(url) == ['1']
+
+	assert len(ValidatorHandler.request_header_list) == 1
+	assert XMLDataGetter.get_stats()['count']['webcache_hit'] == 1
+
+
+#再検証でサーバがエラーを返した場合や接続できない場合は、webcacheの古いデータを使うこと
+@pytest.mark.parametrize('mode', ['error', 'drop'])
+def test_stale_webcache_is_used_when_revalidation_fails(validator_server, monkeypatch, caplog, mode):
+
+	url = validator_server + 'a.xml'
+
+	assert get_item_list(url) == ['1']
+
+	XMLDataGetter.clear_cache()
+	XMLDataGetter.set_webcache_max_age(0)
+	monkeypatch.setattr(ValidatorHandler, 'mode', mode)
+	time.sleep(0.01)
+
+	assert get_item_list(url) == ['1']
+
+	assert len(ValidatorHandler.request_header_list) >= 2
+	assert XMLDataGetter.get_stats()['count'].get('webcache_not_modified', 0) == 0
+	assert 'use stale webcache' in caplog.text
+
+
+#webcacheが無い場合に取得できなければ例外とすること
+def test_request_failure_without_webcache_raises(validator_server, monkeypatch):
+
+	monkeypatch.setattr(ValidatorHandler, 'mode', 'error')
+
+	with pytest.raises(JPXAnalysisError) :
+		XMLDataGetter.get(validator_server + 'a.xml')
+
+
+#以前の形式で保存されたwebcacheは現在の形式に移し替えて使うこと
+def test_legacy_webcache_file_is_migrated(validator_server):
+
+	url = validator_server + 'a.xml'
+
+	hash_str = hashlib.sha256(url.encode('utf-8')).hexdigest()
+	legacy_file_path = os.path.join('webcache', 'xml_text_' + url.translate(str.maketrans('/\\.:', '____')) + '_' + hash_str)
+
+	os.makedirs('webcache')
+	with open(legacy_file_path, 'wb') as f :
+		f.write(XML_BYTES.replace(b'<item>1<', b'<item>legacy<'))
+
+	assert get_item_list(url) == ['legacy']
+
+	assert len(ValidatorHandler.request_header_list) == 0
+	assert os.path.isfile(XMLDataGetter.web_cache.get_record_file_path(url))
+
+
+#イベントループ上で実行中のagetと同じURLをそのイベントループのスレッドからgetしても止まらないこと
+@pytest.mark.skipif(aiohttp == None, reason = 'aiohttp is not installed')
+def test_get_on_loop_thread_does_not_wait_for_aget_of_the_loop(slow_server):
+
+	url = slow_server + 'a.xml'
+	result_list = list()
+
+	async def run() :
+
+		task = asyncio.ensure_future(XMLDataGetter.aget(url))
+		await asyncio.sleep(0.1)
+
+		assert ('xml', url) in XMLDataGetter.inflight_dict
+
+		result_list.append(XMLDataGetter.get(url))
+		result_list.append(await task)
+
+	thread = threading.Thread(target = asyncio.run, args = (run(),), daemon = True)
+	thread.start()
+	thread.join(10)
+
+	assert not thread.is_alive()
+	assert len(result_list) == 2
+	assert [elm.get_string() for elm in result_list[0].select('item')] == ['1']
+
+
+#複数のスレッドから同時に同じURLを取得しても、リクエストは1回だけ送信すること
+def test_concurrent_get_is_single_flight(slow_server):
+
+	url = slow_server + 'a.xml'
+	result_list = list()
+
+	thread_list = [threading.Thread(target = lambda : result_list.append(XMLDataGetter.get(url))) for i in range(5)]
+	for thread in thread_list :
+		thread.start()
+
+	for thread in thread_list :
+		thread.join(10)
+
+	assert len(result_list) == 5
+	assert all(result is result_list[0] for result in result_list)
+	assert SlowHandler.request_path_list == ['/a.xml']
+
+	#待った回数とヒット・ミスの回数の合計はgetの呼び出し回数となる
+	count_dict = XMLDataGetter.get_stats()['count']
+	assert count_dict['memory_miss'] == 1
+	assert count_dict['memory_inflight_wait'] >= 1
+	assert count_dict['memory_hit'] + count_dict['memory_miss'] + count_dict['memory_inflight_wait'] == 5
+	assert XMLDataGetter.inflight_dict == {}
+
+
+#同じイベントループで同時に同じURLを取得しても、リクエストは1回だけ送信すること
+@pytest.mark.skipif(aiohttp == None, reason = 'aiohttp is not installed')
+def test_concurrent_aget_is_single_flight(slow_server):
+
+	url = slow_server + 'a.xml'
+
+	async def run() :
+		return await asyncio.gather(*[XMLDataGetter.aget(url) for i in range(5)])
+
+	result_list = asyncio.run(run())
+
+	assert all(result is result_list[0] for result in result_list)
+	assert SlowHandler.request_path_list == ['/a.xml']
+
+	count_dict = XMLDataGetter.get_stats()['count']
+	assert count_dict['memory_miss'] == 1
+	assert count_dict['memory_inflight_wait'] == 4
+	assert XMLDataGetter.inflight_dict == {}
+
+
+#取得に失敗した場合は待っていた呼び出し元にも同じ例外を渡し、次の呼び出しでは取得し直すこと
+def test_single_flight_error_is_propagated_to_waiters(slow_server, monkeypatch):
+
+	url = slow_server + 'a.xml'
+	monkeypatch.setattr(SlowHandler, 'error_status', 500)
+
+	exception_list = list()
+
+	def get() :
+
+		try :
+			XMLDataGetter.get(url)
+
+		except JPXAnalysisError as e :
+			exception_list.append(e)
+
+	thread_list = [threading.Thread(target = get) for i in range(5)]
+	for thread in thread_list :
+		thread.start()
+
+	for thread in thread_list :
+		thread.join(10)
+
+	assert len(exception_list) == 5
+	assert SlowHandler.request_path_list == ['/a.xml']
+	assert XMLDataGetter.get_stats()['count']['memory_inflight_wait'] == 4
+	assert XMLDataGetter.inflight_dict == {}
+
+
+	monkeypatch.setattr(SlowHandler, 'error_status', None)
+
+	assert [elm.get_string() for elm in XMLDataGetter.get(url).select('item')] == ['1']
+	assert SlowHandler.request_path_list == ['/a.xml', '/a.xml']